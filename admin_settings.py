@@ -6,9 +6,31 @@ Comprehensive configuration interface for all settings
 
 import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
 
+# Parsed config files by path, each reused until the file's (mtime, size) changes
+_config_cache: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+
+def config_stamp(config_file: str = "config.json") -> Tuple[int, int]:
+    """(mtime, size) of a config file, which changes whenever the file does"""
+    st = os.stat(config_file)
+    return (st.st_mtime_ns, st.st_size)
+
+def read_config(config_file: str = "config.json") -> Dict:
+    """Get a parsed config file, re-reading it only after it changes (shared: copy before mutating)"""
+    key = config_stamp(config_file)
+
+    # (key, config) is swapped as one tuple so threads never see a mismatched pair
+    cached = _config_cache.get(config_file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(config_file, 'r') as f:
+        config = json.load(f)
+    _config_cache[config_file] = (key, config)
+    return config
+
 class AdminSettingsManager:
     def __init__(self, config_file: str = "config.json"):
         self.config_file = config_file
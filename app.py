@@ -13,6 +13,7 @@ from call_text_agent import CallTextAgent, MessageType
 from reminder_system import ReminderSystem
 from multi_channel import MultiChannelManager, create_webhook_routes
 from admin_settings import AdminSettingsManager
+from database import appointment_timestamp, format_timestamp
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -107,7 +108,12 @@ def get_appointments():
     """Get all appointments or appointments for a specific user"""
     try:
         user_id = request.args.get('user_id')
-        appointments = agent.get_appointments(user_id)
+        appointments = [
+            {**apt,
+             'created_at': format_timestamp(apt.get('created_at')),
+             'appointment_at': format_timestamp(apt.get('appointment_at'))}
+            for apt in agent.get_appointments(user_id)
+        ]
 
         return jsonify({
             'appointments': appointments,
@@ -170,6 +176,8 @@ def get_chat_history(user_id):
     try:
         limit = int(request.args.get('limit', 50))
         history = agent.get_chat_history(user_id, limit)
+        for msg in history:
+            msg['timestamp'] = format_timestamp(msg['timestamp'])
 
         return jsonify({
             'history': history,
@@ -192,8 +200,8 @@ def get_user_info(user_id):
                     'name': user.name,
                     'email': user.email,
                     'preferences': json.loads(user.preferences) if user.preferences else {},
-                    'created_at': user.created_at,
-                    'last_active': user.last_active
+                    'created_at': format_timestamp(user.created_at),
+                    'last_active': format_timestamp(user.last_active)
                 }
             })
         else:
@@ -879,8 +887,7 @@ def add_walk_in_appointment():
             date=date,
             time=time,
             status='confirmed',
-            notes=notes,
-            created_at=datetime.now().isoformat()
+            notes=notes
         )
 
         success = agent.db.create_appointment(appointment)
@@ -905,8 +912,7 @@ def update_appointment_notes(appointment_id):
         notes = data.get('notes', '')
 
         # Get current appointment
-        appointments = agent.db.get_appointments()
-        appointment = next((apt for apt in appointments if apt['id'] == appointment_id), None)
+        appointment = agent.db.get_appointment(appointment_id)
 
         if not appointment:
             return jsonify({'error': 'Appointment not found'}), 404
@@ -940,8 +946,7 @@ def reschedule_appointment(appointment_id):
             return jsonify({'error': 'New date and time are required'}), 400
 
         # Get current appointment
-        appointments = agent.db.get_appointments()
-        appointment = next((apt for apt in appointments if apt['id'] == appointment_id), None)
+        appointment = agent.db.get_appointment(appointment_id)
 
         if not appointment:
             return jsonify({'error': 'Appointment not found'}), 404
@@ -962,13 +967,14 @@ def reschedule_appointment(appointment_id):
             # Update the appointment
             cursor.execute('''
                 UPDATE appointments
-                SET date = ?, time = ?, notes = ?
+                SET date = ?, time = ?, appointment_at = ?, notes = ?
                 WHERE id = ?
-            ''', (new_date, new_time,
+            ''', (new_date, new_time, appointment_timestamp(new_date, new_time),
                   f"{appointment['notes'] or ''} [Rescheduled from {appointment['date']} {appointment['time']}]".strip(),
                   appointment_id))
 
             conn.commit()
+            agent.db.invalidate_slots_cache()
 
             if cursor.rowcount > 0:
                 return jsonify({
@@ -1015,7 +1021,7 @@ def export_appointments():
                     apt.get('time', ''),
                     apt.get('status', 'confirmed'),
                     apt.get('notes', ''),
-                    apt.get('created_at', ''),
+                    format_timestamp(apt.get('created_at')),
                     apt.get('updated_at', '')
                 ])
 
@@ -350,8 +350,7 @@ Appointment Details:
                 'date': start_datetime.strftime('%Y-%m-%d'),
                 'time': start_datetime.strftime('%I:%M %p'),
                 'status': 'confirmed',
-                'notes': f"Imported from calendar. Original ID: {event['id']}",
-                'created_at': datetime.datetime.now().isoformat()
+                'notes': f"Imported from calendar. Original ID: {event['id']}"
             }
 
             from database import Appointment as DBAppointment
@@ -363,44 +362,71 @@ Appointment Details:
             print(f"❌ Error importing calendar event: {e}")
             return False
 
+    def get_day_events(self, date: str) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """(start, end) of each timed calendar event on a date, in one API call"""
+        start_of_day = datetime.datetime.strptime(date, '%Y-%m-%d')
+        end_of_day = start_of_day + datetime.timedelta(days=1)
+
+        events_result = self.calendar_service.events().list(
+            calendarId=self.calendar_id,
+            timeMin=start_of_day.isoformat() + 'Z',
+            timeMax=end_of_day.isoformat() + 'Z',
+            singleEvents=True,
+            orderBy='startTime'
+        ).execute()
+
+        day_events = []
+        for event in events_result.get('items', []):
+            if 'dateTime' in event['start']:
+                start_time = datetime.datetime.fromisoformat(
+                    event['start']['dateTime'].replace('Z', '+00:00')
+                )
+                end_time = datetime.datetime.fromisoformat(
+                    event['end']['dateTime'].replace('Z', '+00:00')
+                )
+                day_events.append((start_time, end_time))
+
+        return day_events
+
     def get_busy_times(self, date: str) -> List[Tuple[str, str]]:
         """Get busy times for a specific date from calendar"""
         if not self.is_enabled():
             return []
 
         try:
-            start_of_day = datetime.datetime.strptime(date, '%Y-%m-%d')
-            end_of_day = start_of_day + datetime.timedelta(days=1)
+            return [
+                (start_time.strftime('%I:%M %p'), end_time.strftime('%I:%M %p'))
+                for start_time, end_time in self.get_day_events(date)
+            ]
 
-            events_result = self.calendar_service.events().list(
-                calendarId=self.calendar_id,
-                timeMin=start_of_day.isoformat() + 'Z',
-                timeMax=end_of_day.isoformat() + 'Z',
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+        except Exception as e:
+            print(f"❌ Error getting busy times: {e}")
+            return []
 
-            events = events_result.get('items', [])
-            busy_times = []
+    def list_busy_intervals(self, date: str) -> List[Tuple[int, int]]:
+        """Busy (start, end) minutes from midnight of a date, for checking many slots locally"""
+        if not self.is_enabled():
+            return []
 
-            for event in events:
-                if 'dateTime' in event['start']:
-                    start_time = datetime.datetime.fromisoformat(
-                        event['start']['dateTime'].replace('Z', '+00:00')
-                    )
-                    end_time = datetime.datetime.fromisoformat(
-                        event['end']['dateTime'].replace('Z', '+00:00')
-                    )
+        try:
+            # Queries treat local times as UTC ('Z'), so event times are read back the same way
+            start_of_day = datetime.datetime.strptime(date, '%Y-%m-%d')
+            intervals = []
+            for start_time, end_time in self.get_day_events(date):
+                if start_time.tzinfo is not None:
+                    start_time = start_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                if end_time.tzinfo is not None:
+                    end_time = end_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
 
-                    busy_times.append((
-                        start_time.strftime('%I:%M %p'),
-                        end_time.strftime('%I:%M %p')
-                    ))
+                intervals.append((
+                    int((start_time - start_of_day).total_seconds() // 60),
+                    int(-((start_of_day - end_time).total_seconds() // 60))  # Round partial minutes up
+                ))
 
-            return busy_times
+            return sorted(intervals)
 
         except Exception as e:
-            print(f"❌ Error getting busy times: {e}")
+            print(f"❌ Error listing busy intervals: {e}")
             return []
 
     def parse_appointment_datetime(self, date: str, time: str) -> datetime.datetime:
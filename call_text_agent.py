@@ -4,6 +4,7 @@ Simple Call/Text Agent with Predefined Q&A and Appointment Booking
 This agent handles incoming messages and calls with automated responses.
 """
 
+import bisect
 import datetime
 import json
 import re
@@ -12,6 +13,12 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 from database import DatabaseManager, Appointment as DBAppointment
 
+# Canonical slot order for a full business day; Saturday uses a subset
+WEEKDAY_SLOTS = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM",
+                 "1:00 PM", "2:00 PM", "3:00 PM", "4:00 PM", "5:00 PM"]
+SATURDAY_SLOTS = ["10:00 AM", "11:00 AM", "12:00 PM", "1:00 PM", "2:00 PM", "3:00 PM"]
+SLOT_INDEX = {t: i for i, t in enumerate(WEEKDAY_SLOTS)}
+
 class MessageType(Enum):
     TEXT = "text"
     CALL = "call"
@@ -56,6 +63,12 @@ class CallTextAgent:
         self.db = DatabaseManager(db_path)
         self.faq_database = self._load_faq()
         self.available_slots = self._generate_available_slots()
+        self._booking_steps = {
+            'name': self._step_name,
+            'service': self._step_service,
+            'date': self._step_date,
+            'time': self._step_time
+        }
 
         # Initialize database with available slots
         self.db.initialize_available_slots(self.available_slots)
@@ -88,10 +101,9 @@ class CallTextAgent:
                 
             # Generate time slots
             if date.weekday() == 5:  # Saturday
-                time_slots = ["10:00 AM", "11:00 AM", "12:00 PM", "1:00 PM", "2:00 PM", "3:00 PM"]
+                time_slots = list(SATURDAY_SLOTS)
             else:  # Monday-Friday
-                time_slots = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM", 
-                             "1:00 PM", "2:00 PM", "3:00 PM", "4:00 PM", "5:00 PM"]
+                time_slots = list(WEEKDAY_SLOTS)
             
             slots[date_str] = time_slots
         
@@ -191,34 +203,41 @@ class CallTextAgent:
     def _handle_booking(self, session: UserSession, message: str) -> str:
         """Handle the booking conversation flow"""
         step = session.context.get('booking_step', 'name')
-        
-        if step == 'name':
-            session.context['name'] = message.strip()
-            session.context['booking_step'] = 'service'
-            return f"Nice to meet you, {message.strip()}! What service are you interested in?\n\n• Haircut\n• Styling\n• Coloring\n• Treatment\n• Special Event"
-        
-        elif step == 'service':
-            session.context['service'] = message.strip()
-            session.context['booking_step'] = 'date'
-            return self._show_available_dates()
-        
-        elif step == 'date':
-            if message.strip() in self.available_slots:
-                session.context['date'] = message.strip()
-                session.context['booking_step'] = 'time'
-                return self._show_available_times(message.strip())
-            else:
-                return "Please select a valid date from the options above."
-        
-        elif step == 'time':
-            selected_date = session.context['date']
-            if message.strip() in self.available_slots[selected_date]:
-                session.context['time'] = message.strip()
-                session.state = ConversationState.CONFIRMATION
-                return self._show_booking_confirmation(session)
-            else:
-                return "Please select a valid time from the available options."
-        
+        return self._booking_steps.get(step, self._step_restart)(session, message)
+
+    def _step_name(self, session: UserSession, message: str) -> str:
+        """Booking step: capture the customer's name"""
+        session.context['name'] = message.strip()
+        session.context['booking_step'] = 'service'
+        return f"Nice to meet you, {message.strip()}! What service are you interested in?\n\n• Haircut\n• Styling\n• Coloring\n• Treatment\n• Special Event"
+
+    def _step_service(self, session: UserSession, message: str) -> str:
+        """Booking step: capture the requested service"""
+        session.context['service'] = message.strip()
+        session.context['booking_step'] = 'date'
+        return self._show_available_dates()
+
+    def _step_date(self, session: UserSession, message: str) -> str:
+        """Booking step: capture the appointment date"""
+        if message.strip() in self.available_slots:
+            session.context['date'] = message.strip()
+            session.context['booking_step'] = 'time'
+            return self._show_available_times(message.strip())
+        else:
+            return "Please select a valid date from the options above."
+
+    def _step_time(self, session: UserSession, message: str) -> str:
+        """Booking step: capture the appointment time"""
+        selected_date = session.context['date']
+        if message.strip() in self.available_slots[selected_date]:
+            session.context['time'] = message.strip()
+            session.state = ConversationState.CONFIRMATION
+            return self._show_booking_confirmation(session)
+        else:
+            return "Please select a valid time from the available options."
+
+    def _step_restart(self, session: UserSession, message: str) -> str:
+        """Fallback for an unknown booking step"""
         return "I didn't understand. Let me restart the booking process."
     
     def _show_available_dates(self) -> str:
@@ -294,8 +313,7 @@ class CallTextAgent:
                 name=session.context['name'],
                 service=session.context['service'],
                 date=session.context['date'],
-                time=session.context['time'],
-                created_at=datetime.datetime.now().isoformat()
+                time=session.context['time']
             )
 
             # Save to database
@@ -307,9 +325,6 @@ class CallTextAgent:
             if session.context.get('name'):
                 self.db.create_or_update_user(session.phone_number, session.context['name'])
 
-            # Book the slot
-            self.db.book_slot(appointment.date, appointment.time)
-
             # Remove the time slot from available slots cache
             if appointment.date in self.available_slots:
                 if appointment.time in self.available_slots[appointment.date]:
@@ -342,18 +357,15 @@ class CallTextAgent:
     def cancel_appointment(self, appointment_id: str) -> bool:
         """Cancel an appointment by ID"""
         # Get appointment details first
-        appointments = self.db.get_appointments()
-        appointment = next((apt for apt in appointments if apt['id'] == appointment_id), None)
+        appointment = self.db.get_appointment(appointment_id)
 
         if appointment and self.db.cancel_appointment(appointment_id):
-            # Release the slot
-            self.db.release_slot(appointment['date'], appointment['time'])
-
             # Add the time slot back to available slots cache
             if appointment['date'] in self.available_slots:
                 if appointment['time'] not in self.available_slots[appointment['date']]:
-                    self.available_slots[appointment['date']].append(appointment['time'])
-                    self.available_slots[appointment['date']].sort()
+                    # Insert in schedule order; unknown times go to the end
+                    bisect.insort(self.available_slots[appointment['date']], appointment['time'],
+                                  key=lambda t: SLOT_INDEX.get(t, len(SLOT_INDEX)))
             return True
         return False
 
@@ -5,20 +5,179 @@ SQLite database for persistent data storage
 """
 
 import sqlite3
+import atexit
 import datetime
 import json
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, List, Optional, Tuple
+from collections import deque
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+# WAL lets readers run alongside a writer; synchronous=NORMAL is safe under WAL
+# and avoids an fsync on every commit. journal_mode persists in the file, the
+# rest are per-connection.
+SQLITE_PRAGMAS = '''
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -65536;
+    PRAGMA mmap_size = 268435456;
+'''
+
+# Prepared statements are cached per connection, keyed by SQL text. Pooled
+# connections live for the whole thread, so hot queries are compiled once.
+SQLITE_CACHED_STATEMENTS = 256
+
+# Rows pulled per fetchmany() call when streaming large result sets
+FETCH_BATCH_SIZE = 256
+
+# Minimum seconds between last_active writes for the same user
+ACTIVITY_WRITE_INTERVAL = 60
+
+# Chat messages are buffered and written in one transaction when the buffer
+# reaches CHAT_FLUSH_SIZE or CHAT_FLUSH_INTERVAL seconds after the first write
+# (also the wait before retrying a failed write)
+CHAT_FLUSH_SIZE = 64
+CHAT_FLUSH_INTERVAL = 1.0
+
+# Messages held while the database can't keep up; beyond this callers write synchronously
+CHAT_BUFFER_LIMIT = 10000
+
+# Table definitions; {table} is filled in so migrations can build a copy
+TABLE_SCHEMAS = {
+    # Users table
+    'users': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            phone TEXT PRIMARY KEY,
+            name TEXT,
+            email TEXT,
+            preferences BLOB,
+            created_at INTEGER,
+            last_active INTEGER
+        ) WITHOUT ROWID
+    ''',
+
+    # Appointments table
+    'appointments': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id TEXT PRIMARY KEY,
+            user_phone TEXT,
+            name TEXT,
+            service TEXT,
+            date TEXT,
+            time TEXT,
+            status TEXT DEFAULT 'pending',
+            notes TEXT,
+            created_at INTEGER,
+            reminder_sent INTEGER DEFAULT 0,
+            appointment_at INTEGER,
+            FOREIGN KEY (user_phone) REFERENCES users (phone)
+        )
+    ''',
+
+    # Chat messages table
+    'chat_messages': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_phone TEXT,
+            message TEXT,
+            response TEXT,
+            timestamp INTEGER,
+            session_id TEXT,
+            FOREIGN KEY (user_phone) REFERENCES users (phone)
+        )
+    ''',
+
+    # Bookable slots; availability is derived from appointments (v_available_slots)
+    'master_slots': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            date TEXT,
+            time TEXT,
+            PRIMARY KEY (date, time)
+        ) WITHOUT ROWID
+    ''',
+
+    # Business settings table
+    'business_settings': '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        ) WITHOUT ROWID
+    '''
+}
+
+# Stored in PRAGMA user_version; bump when adding a step to migrate()
+SCHEMA_VERSION = 5
+
+# SQLite 3.45+ stores JSON in its binary JSONB form; older versions keep the
+# JSON1 text form. json() reads either back as text.
+JSONB_SUPPORTED = sqlite3.sqlite_version_info >= (3, 45, 0)
+JSON_ENCODE = 'jsonb' if JSONB_SUPPORTED else 'json'
+
+# Converts a legacy ISO-8601 local-time string to Unix epoch seconds
+EPOCH_FROM_ISO = "CASE WHEN typeof({col}) = 'text' THEN CAST(strftime('%s', {col}, 'utc') AS INTEGER) ELSE {col} END"
+
+# Explicit column lists (in table order) so queries never depend on SELECT *
+USER_COLUMNS = 'phone, name, email, json(preferences) AS preferences, created_at, last_active'
+APPOINTMENT_COLUMNS = 'id, user_phone, name, service, date, time, status, notes, created_at, reminder_sent'
+CHAT_MESSAGE_COLUMNS = 'id, user_phone, message, response, timestamp, session_id'
+
+# get_appointments SQL for each filter shape, keyed by (user_phone?, status?),
+# so every call reuses one of four fixed statements
+APPOINTMENT_QUERIES = {
+    (False, False): f'SELECT {APPOINTMENT_COLUMNS} FROM appointments ORDER BY date, time',
+    (True, False): f'SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE user_phone = ? ORDER BY date, time',
+    (False, True): f'SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE status = ? ORDER BY date, time',
+    (True, True): f'SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE user_phone = ? AND status = ? ORDER BY date, time',
+}
+
+def appointment_timestamp(date: str, time_str: str) -> Optional[int]:
+    """Unix epoch seconds for an appointment's local date and time (None if unparseable)"""
+    for fmt in ("%Y-%m-%d %I:%M %p", "%Y-%m-%d %H:%M"):
+        try:
+            return int(datetime.datetime.strptime(f"{date} {time_str}", fmt).timestamp())
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def format_timestamp(timestamp: Optional[int]) -> str:
+    """Format a stored epoch timestamp as local ISO-8601 ('' if unset)"""
+    return datetime.datetime.fromtimestamp(timestamp).isoformat() if timestamp else ""
+
+class ReadCache:
+    """Read-mostly query results shared by every manager of one database file"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.settings: Dict[str, Optional[str]] = {}
+        self.slots: Optional[Dict[str, List[str]]] = None
+        # Bumped on every appointment write made through a manager in this process
+        self.appointments_version = 0
+        # Long-lived connection whose PRAGMA data_version moves on any other
+        # connection's commit; shared so the token is the same on every thread
+        self.version_conn: Optional[sqlite3.Connection] = None
+        # appointments_version() token that settings and slots were loaded under
+        self.loaded_version: Optional[Tuple[int, int]] = None
+
+# Keyed by db_path so a write through one DatabaseManager invalidates the
+# cache seen by the others (agent, reminders, scheduler, ...)
+_READ_CACHES: Dict[str, ReadCache] = {}
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that can be tracked by the per-thread pool"""
+    pass
+
 @dataclass
 class User:
     phone: str
     name: str = ""
     email: str = ""
     preferences: str = ""  # JSON string
-    created_at: str = ""
-    last_active: str = ""
+    created_at: int = 0  # Unix epoch seconds
+    last_active: int = 0
 
 @dataclass
 class Appointment:
@@ -30,7 +189,7 @@ class Appointment:
     time: str
     status: str = "pending"  # pending, confirmed, cancelled, completed
     notes: str = ""
-    created_at: str = ""
+    created_at: int = 0  # Unix epoch seconds
     reminder_sent: bool = False
 
 @dataclass
@@ -39,84 +198,172 @@ class ChatMessage:
     user_phone: str
     message: str
     response: str
-    timestamp: str
+    timestamp: int  # Unix epoch seconds
     session_id: str = ""
 
 class DatabaseManager:
     def __init__(self, db_path: str = "voiceagent.db"):
         self.db_path = db_path
+        self._tls = threading.local()
+        self._pool = weakref.WeakSet()
+        self._pool_lock = threading.Lock()
+        self._activity_cache: Dict[str, float] = {}
+        self._activity_pending: Dict[str, int] = {}
+        self._activity_lock = threading.Lock()
+        self._chat_buffer = deque()
+        self._chat_lock = threading.Lock()
+        # Signalled on the first buffered message and when a batch fills up
+        self._chat_ready = threading.Condition(self._chat_lock)
+        self._chat_first_at = 0.0
+        self._chat_writer = None
+        # Serializes flushes on the writer's own connection, so a flush that
+        # returns has every earlier message committed
+        self._chat_flush_lock = threading.Lock()
+        self._chat_conn = None
+        self._cache = _READ_CACHES.setdefault(db_path, ReadCache())
         self.init_database()
 
+        # Don't lose buffered chat messages on interpreter shutdown
+        atexit.register(self.flush_chat_messages)
+
     def init_database(self):
         """Initialize database tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    phone TEXT PRIMARY KEY,
-                    name TEXT,
-                    email TEXT,
-                    preferences TEXT,
-                    created_at TEXT,
-                    last_active TEXT
-                )
-            ''')
+            for table, schema in TABLE_SCHEMAS.items():
+                cursor.execute(schema.format(table=table))
 
-            # Appointments table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS appointments (
-                    id TEXT PRIMARY KEY,
-                    user_phone TEXT,
-                    name TEXT,
-                    service TEXT,
-                    date TEXT,
-                    time TEXT,
-                    status TEXT DEFAULT 'pending',
-                    notes TEXT,
-                    created_at TEXT,
-                    reminder_sent INTEGER DEFAULT 0,
-                    FOREIGN KEY (user_phone) REFERENCES users (phone)
-                )
-            ''')
+            self.migrate(conn)
 
-            # Chat messages table
+            # Indexes for the hot lookup paths
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_appt_date_time_status ON appointments(date, time, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_appt_user ON appointments(user_phone)')
+            # Partial index: only pending, unreminded rows, so it stays as small as the reminder queue
+            cursor.execute('DROP INDEX IF EXISTS idx_appt_reminder')
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS chat_messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_phone TEXT,
-                    message TEXT,
-                    response TEXT,
-                    timestamp TEXT,
-                    session_id TEXT,
-                    FOREIGN KEY (user_phone) REFERENCES users (phone)
-                )
+                CREATE INDEX IF NOT EXISTS idx_reminders_pending ON appointments(date)
+                WHERE status = 'pending' AND reminder_sent = 0
             ''')
-
-            # Available slots table
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS available_slots (
-                    date TEXT,
-                    time TEXT,
-                    is_available INTEGER DEFAULT 1,
-                    PRIMARY KEY (date, time)
-                )
+                CREATE INDEX IF NOT EXISTS idx_reminders_due ON appointments(appointment_at)
+                WHERE status = 'pending' AND reminder_sent = 0
             ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_user_ts ON chat_messages(user_phone, timestamp DESC)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active)')
 
-            # Business settings table
+            # Free slots: every master slot without a live appointment on it
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS business_settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
+                CREATE VIEW IF NOT EXISTS v_available_slots AS
+                SELECT s.date, s.time FROM master_slots s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM appointments a
+                    WHERE a.date = s.date AND a.time = s.time AND a.status != 'cancelled'
                 )
             ''')
 
             conn.commit()
 
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get this thread's persistent database connection"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._tls.conn = conn
+
+            # Weak references so connections of finished threads can be collected
+            with self._pool_lock:
+                self._pool.add(conn)
+        return conn
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a tuned connection to the database file"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               factory=PooledConnection,
+                               cached_statements=SQLITE_CACHED_STATEMENTS)
+        conn.executescript(SQLITE_PRAGMAS)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _appointment_from_row(row: sqlite3.Row) -> Dict:
+        """Convert an appointments row to a plain dict"""
+        appointment = dict(row)
+        appointment['reminder_sent'] = bool(appointment['reminder_sent'])
+        return appointment
+
+    def migrate(self, conn: sqlite3.Connection):
+        """Upgrade an existing database file to SCHEMA_VERSION"""
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+
+        if version >= SCHEMA_VERSION:
+            return
+
+        try:
+            cursor.execute('BEGIN')
+
+            if version < 1:
+                # v1: timestamps stored as integer Unix epoch instead of ISO text
+                self._rebuild_table(cursor, 'users', {'created_at': EPOCH_FROM_ISO, 'last_active': EPOCH_FROM_ISO})
+                self._rebuild_table(cursor, 'appointments', {'created_at': EPOCH_FROM_ISO})
+                self._rebuild_table(cursor, 'chat_messages', {'timestamp': EPOCH_FROM_ISO})
+
+            if version < 2:
+                # v2: preferences kept as JSONB where SQLite supports it
+                self._rebuild_table(cursor, 'users', {'preferences': JSON_ENCODE + '({col})'})
+
+            if version < 3:
+                # v3: key-addressed tables clustered on their primary key
+                # (available_slots is replaced outright in v4)
+                for table in ('users', 'business_settings'):
+                    self._rebuild_table(cursor, table, {})
+
+            if version < 4:
+                # v4: available_slots flag table replaced by master_slots + view
+                cursor.execute('''
+                    SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'available_slots'
+                ''')
+                if cursor.fetchone():
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO master_slots (date, time)
+                        SELECT date, time FROM available_slots
+                    ''')
+                    cursor.execute('DROP TABLE available_slots')
+
+            if version < 5:
+                # v5: appointment start as epoch seconds, for reminder windows
+                cursor.execute('PRAGMA table_info(appointments)')
+                if 'appointment_at' not in [row[1] for row in cursor.fetchall()]:
+                    cursor.execute('ALTER TABLE appointments ADD COLUMN appointment_at INTEGER')
+
+                cursor.execute('SELECT id, date, time FROM appointments WHERE appointment_at IS NULL')
+                cursor.executemany('UPDATE appointments SET appointment_at = ? WHERE id = ?', [
+                    (appointment_timestamp(date, time_str), apt_id)
+                    for apt_id, date, time_str in cursor.fetchall()
+                ])
+
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Database error migrating schema: {e}")
+            raise
+
+    def _rebuild_table(self, cursor: sqlite3.Cursor, table: str, conversions: Dict[str, str]):
+        """Recreate a table from TABLE_SCHEMAS, copying rows through conversions"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        columns = [row[1] for row in cursor.fetchall()]
+        select = ', '.join(conversions.get(col, '{col}').format(col=col) for col in columns)
+
+        # Copy, drop, rename: renaming the old table instead would rewrite
+        # foreign keys in other tables to point at it
+        cursor.execute(TABLE_SCHEMAS[table].format(table=f'{table}_new'))
+        cursor.execute(f'INSERT INTO {table}_new ({", ".join(columns)}) SELECT {select} FROM {table}')
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
 
     # User management
     def create_or_update_user(self, phone: str, name: str = "", email: str = "", preferences: Dict = None) -> User:
@@ -124,16 +371,22 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            now = datetime.datetime.now().isoformat()
+            now = int(time.time())
             prefs_json = json.dumps(preferences or {})
 
-            cursor.execute('''
-                INSERT OR REPLACE INTO users
+            # Update in place on conflict; created_at is only set on first insert
+            cursor.execute(f'''
+                INSERT INTO users
                 (phone, name, email, preferences, created_at, last_active)
-                VALUES (?, ?, ?, ?,
-                    COALESCE((SELECT created_at FROM users WHERE phone = ?), ?),
-                    ?)
-            ''', (phone, name, email, prefs_json, phone, now, now))
+                VALUES (?, ?, ?, {JSON_ENCODE}(?), ?, ?)
+                ON CONFLICT(phone) DO UPDATE SET
+                    name = excluded.name,
+                    email = excluded.email,
+                    preferences = excluded.preferences,
+                    last_active = excluded.last_active
+                RETURNING created_at
+            ''', (phone, name, email, prefs_json, now, now))
+            created_at = cursor.fetchone()[0]
 
             conn.commit()
 
@@ -142,7 +395,7 @@ class DatabaseManager:
                 name=name,
                 email=email,
                 preferences=prefs_json,
-                created_at=now,
+                created_at=created_at,
                 last_active=now
             )
 
@@ -150,7 +403,7 @@ class DatabaseManager:
         """Get user by phone"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE phone = ?', (phone,))
+            cursor.execute(f'SELECT {USER_COLUMNS} FROM users WHERE phone = ?', (phone,))
             row = cursor.fetchone()
 
             if row:
@@ -159,18 +412,56 @@ class DatabaseManager:
                     name=row[1] or "",
                     email=row[2] or "",
                     preferences=row[3] or "{}",
-                    created_at=row[4] or "",
-                    last_active=row[5] or ""
+                    created_at=row[4] or 0,
+                    last_active=row[5] or 0
                 )
             return None
 
+    def get_user_preference(self, phone: str, key: str, default=None):
+        """Get a single user preference without decoding the whole document"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT json_extract(preferences, '$.' || ?) FROM users WHERE phone = ?
+            ''', (key, phone))
+            row = cursor.fetchone()
+
+            return row[0] if row and row[0] is not None else default
+
     def update_user_activity(self, phone: str):
-        """Update user's last activity"""
+        """Update user's last activity (at most once per ACTIVITY_WRITE_INTERVAL)"""
+        now = time.time()
+        last_active = int(now)
+
+        with self._activity_lock:
+            if now - self._activity_cache.get(phone, 0) < ACTIVITY_WRITE_INTERVAL:
+                # Recently written; remember the newest value for close()
+                self._activity_pending[phone] = last_active
+                return
+            self._activity_cache[phone] = now
+            self._activity_pending.pop(phone, None)
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE users SET last_active = ? WHERE phone = ?
-            ''', (datetime.datetime.now().isoformat(), phone))
+            ''', (last_active, phone))
+            conn.commit()
+
+    def flush_user_activity(self):
+        """Write any throttled last_active updates"""
+        with self._activity_lock:
+            pending = self._activity_pending
+            self._activity_pending = {}
+
+        if not pending:
+            return
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE users SET last_active = ? WHERE phone = ?
+            ''', [(last_active, phone) for phone, last_active in pending.items()])
             conn.commit()
 
     # Appointment management
@@ -180,19 +471,16 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                # Check if slot is available
-                cursor.execute('''
-                    SELECT COUNT(*) FROM appointments
-                    WHERE date = ? AND time = ? AND status != 'cancelled'
-                ''', (appointment.date, appointment.time))
-
-                if cursor.fetchone()[0] > 0:
-                    return False  # Slot already taken
-
+                # Insert only if the slot is still free (check and insert in one statement)
                 cursor.execute('''
                     INSERT INTO appointments
-                    (id, user_phone, name, service, date, time, status, notes, created_at, reminder_sent)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    (id, user_phone, name, service, date, time, status, notes, created_at, reminder_sent,
+                     appointment_at)
+                    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM appointments
+                        WHERE date = ? AND time = ? AND status != 'cancelled'
+                    )
                 ''', (
                     appointment.id,
                     appointment.user_phone,
@@ -202,12 +490,18 @@ class DatabaseManager:
                     appointment.time,
                     appointment.status,
                     appointment.notes,
-                    appointment.created_at or datetime.datetime.now().isoformat(),
-                    appointment.reminder_sent
+                    appointment.created_at or int(time.time()),
+                    appointment.reminder_sent,
+                    appointment_timestamp(appointment.date, appointment.time),
+                    appointment.date,
+                    appointment.time
                 ))
 
                 conn.commit()
-                return True
+                if cursor.rowcount > 0:
+                    self.invalidate_slots_cache()
+                    return True
+                return False  # 0 rows means the slot was already taken
 
         except sqlite3.Error as e:
             print(f"Database error creating appointment: {e}")
@@ -218,47 +512,106 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            query = 'SELECT * FROM appointments WHERE 1=1'
-            params = []
-
-            if user_phone:
-                query += ' AND user_phone = ?'
-                params.append(user_phone)
-
-            if status:
-                query += ' AND status = ?'
-                params.append(status)
-
-            query += ' ORDER BY date, time'
+            query = APPOINTMENT_QUERIES[bool(user_phone), bool(status)]
+            params = [value for value in (user_phone, status) if value]
 
+            cursor.arraysize = FETCH_BATCH_SIZE
             cursor.execute(query, params)
-            rows = cursor.fetchall()
 
             appointments = []
-            for row in rows:
-                appointments.append({
-                    'id': row[0],
-                    'user_phone': row[1],
-                    'name': row[2],
-                    'service': row[3],
-                    'date': row[4],
-                    'time': row[5],
-                    'status': row[6],
-                    'notes': row[7],
-                    'created_at': row[8],
-                    'reminder_sent': bool(row[9])
-                })
+            while True:
+                batch = cursor.fetchmany()
+                if not batch:
+                    break
+                appointments.extend(self._appointment_from_row(row) for row in batch)
 
             return appointments
 
+    def get_appointment(self, appointment_id: str) -> Optional[Dict]:
+        """Get a single appointment by ID"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE id = ? LIMIT 1', (appointment_id,))
+            row = cursor.fetchone()
+
+            if row:
+                return self._appointment_from_row(row)
+            return None
+
+    def get_appointments_by_date(self, date: str, status: str = None) -> List[Dict]:
+        """Get one day's appointments in time order, optionally with a given status"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                # Answered from idx_appt_date_time_status, already in time order
+                if status:
+                    cursor.execute(f'''
+                        SELECT {APPOINTMENT_COLUMNS} FROM appointments
+                        WHERE date = ? AND status = ?
+                        ORDER BY time
+                    ''', (date, status))
+                else:
+                    cursor.execute(f'''
+                        SELECT {APPOINTMENT_COLUMNS} FROM appointments
+                        WHERE date = ?
+                        ORDER BY time
+                    ''', (date,))
+
+                return [self._appointment_from_row(row) for row in cursor.fetchall()]
+
+        except sqlite3.Error as e:
+            print(f"Database error in get_appointments_by_date: {e}")
+            return []
+
+    def get_appointment_stats(self, since_date: str, durations: Dict[str, int],
+                              default_duration: int = 60, default_start: int = 9 * 60) -> Dict:
+        """Appointment count plus per-day (count, work minutes, first start, last end) from since_date on"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                # Start minute of day from appointment_at (NULL when the time was unparseable);
+                # the last-starting appointment's end is packed as start * 1440 + end for MAX()
+                duration_case = ' '.join('WHEN ? THEN ?' for _ in durations)
+                cursor.execute(f'''
+                    SELECT date, COUNT(*),
+                           SUM(duration),
+                           MIN(start_minute),
+                           MAX(start_minute * 1440 + (start_minute + duration) % 1440)
+                    FROM (
+                        SELECT date,
+                               COALESCE(
+                                   strftime('%H', appointment_at, 'unixepoch', 'localtime') * 60 +
+                                   strftime('%M', appointment_at, 'unixepoch', 'localtime'), ?
+                               ) AS start_minute,
+                               {f'CASE service {duration_case} ELSE ? END' if durations else '?'} AS duration
+                        FROM appointments
+                    )
+                    GROUP BY date
+                ''', (default_start, *[value for item in durations.items() for value in item], default_duration))
+
+                total = 0
+                days = {}
+                for date, count, work, first_start, last_packed in cursor.fetchall():
+                    total += count
+                    if date >= since_date:
+                        days[date] = (count, work, first_start, last_packed % 1440)
+
+                return {'total_appointments': total, 'days': days}
+
+        except sqlite3.Error as e:
+            print(f"Database error in get_appointment_stats: {e}")
+            return {'total_appointments': 0, 'days': {}}
+
     def get_appointments_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
         """Get appointments within a specific date range"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
 
-                query = '''
-                    SELECT * FROM appointments
+                query = f'''
+                    SELECT {APPOINTMENT_COLUMNS} FROM appointments
                     WHERE date BETWEEN ? AND ?
                     ORDER BY date, time
                 '''
@@ -266,22 +619,7 @@ class DatabaseManager:
                 cursor.execute(query, (start_date, end_date))
                 rows = cursor.fetchall()
 
-                appointments = []
-                for row in rows:
-                    appointments.append({
-                        'id': row[0],
-                        'user_phone': row[1],
-                        'name': row[2],
-                        'service': row[3],
-                        'date': row[4],
-                        'time': row[5],
-                        'status': row[6],
-                        'notes': row[7],
-                        'created_at': row[8],
-                        'reminder_sent': bool(row[9])
-                    })
-
-                return appointments
+                return [self._appointment_from_row(row) for row in rows]
 
         except sqlite3.Error as e:
             print(f"Database error in get_appointments_by_date_range: {e}")
@@ -297,6 +635,7 @@ class DatabaseManager:
                 ''', (status, appointment_id))
 
                 conn.commit()
+                self.invalidate_slots_cache()
                 return cursor.rowcount > 0
 
         except sqlite3.Error as e:
@@ -315,119 +654,231 @@ class DatabaseManager:
             # Get appointments for tomorrow that haven't had reminders sent
             tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
 
-            cursor.execute('''
-                SELECT * FROM appointments
+            cursor.execute(f'''
+                SELECT {APPOINTMENT_COLUMNS} FROM appointments
                 WHERE date = ? AND status = 'pending' AND reminder_sent = 0
             ''', (tomorrow,))
 
             rows = cursor.fetchall()
 
-            appointments = []
-            for row in rows:
-                appointments.append({
-                    'id': row[0],
-                    'user_phone': row[1],
-                    'name': row[2],
-                    'service': row[3],
-                    'date': row[4],
-                    'time': row[5],
-                    'status': row[6],
-                    'notes': row[7],
-                    'created_at': row[8],
-                    'reminder_sent': bool(row[9])
-                })
+            return [self._appointment_from_row(row) for row in rows]
 
-            return appointments
+    def get_appointments_due(self, windows: List[Tuple[int, int]]) -> List[Dict]:
+        """Get pending, unreminded appointments starting inside any (start, end) epoch window"""
+        if not windows:
+            return []
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            conditions = ' OR '.join(['appointment_at BETWEEN ? AND ?'] * len(windows))
+            cursor.execute(f'''
+                SELECT {APPOINTMENT_COLUMNS} FROM appointments
+                WHERE status = 'pending' AND reminder_sent = 0 AND ({conditions})
+                ORDER BY appointment_at
+            ''', [bound for window in windows for bound in window])
+
+            return [self._appointment_from_row(row) for row in cursor.fetchall()]
+
+    def appointments_version(self) -> Tuple[int, int]:
+        """Get a token that changes whenever the appointments may have changed"""
+        with self._cache.lock:
+            # data_version catches commits from every other connection, including
+            # other processes; the counter also covers writes not yet seen there
+            if self._cache.version_conn is None:
+                self._cache.version_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            data_version = self._cache.version_conn.execute('PRAGMA data_version').fetchone()[0]
+            return (self._cache.appointments_version, data_version)
+
+    def _read_cache_version(self) -> Tuple[int, int]:
+        """Get the current token, first dropping settings and slots cached under an older one"""
+        version = self.appointments_version()
+        with self._cache.lock:
+            # Any commit, including one from another process, may have changed them
+            if version != self._cache.loaded_version:
+                self._cache.settings = {}
+                self._cache.slots = None
+                self._cache.loaded_version = version
+        return version
 
     def mark_reminder_sent(self, appointment_id: str) -> bool:
         """Mark reminder as sent for appointment"""
+        return self.mark_reminders_sent([appointment_id]) > 0
+
+    def mark_reminders_sent(self, ids: List[str]) -> int:
+        """Mark reminders as sent for a batch of appointments in one transaction"""
+        if not ids:
+            return 0
+
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+
+                # IDs go in as one JSON array, so any batch size is a single
+                # statement with a fixed text that stays in the statement cache
                 cursor.execute('''
-                    UPDATE appointments SET reminder_sent = 1 WHERE id = ?
-                ''', (appointment_id,))
+                    UPDATE appointments SET reminder_sent = 1
+                    WHERE id IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(list(ids)),))
+                updated = cursor.rowcount
 
                 conn.commit()
-                return cursor.rowcount > 0
+
+            with self._cache.lock:
+                self._cache.appointments_version += 1
+
+            return updated
 
         except sqlite3.Error as e:
-            print(f"Database error marking reminder: {e}")
-            return False
+            print(f"Database error marking reminders: {e}")
+            return 0
 
     # Chat history
     def save_chat_message(self, user_phone: str, message: str, response: str, session_id: str = "") -> bool:
-        """Save chat message and response"""
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO chat_messages
-                    (user_phone, message, response, timestamp, session_id)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    user_phone,
-                    message,
-                    response,
-                    datetime.datetime.now().isoformat(),
-                    session_id
-                ))
+        """Queue chat message and response for a batched write"""
+        row = (user_phone, message, response, int(time.time()), session_id)
+
+        with self._chat_lock:
+            self._chat_buffer.append(row)
+            pending = len(self._chat_buffer)
+
+            if pending == 1:
+                self._chat_first_at = time.monotonic()
+            if pending == 1 or pending >= CHAT_FLUSH_SIZE:
+                self._chat_ready.notify()
+
+            if self._chat_writer is None:
+                self._chat_writer = threading.Thread(target=self._chat_writer_loop,
+                                                     name='chat-writer', daemon=True)
+                self._chat_writer.start()
+
+        # The writer is falling behind: write on the caller's thread rather than drop messages
+        if pending >= CHAT_BUFFER_LIMIT:
+            return self.flush_chat_messages()
+
+        return True
+
+    def _chat_writer_loop(self):
+        """Write buffered chat messages when a batch fills or CHAT_FLUSH_INTERVAL passes"""
+        while True:
+            with self._chat_lock:
+                while not self._chat_buffer:
+                    self._chat_ready.wait()
+
+                deadline = self._chat_first_at + CHAT_FLUSH_INTERVAL
+                while 0 < len(self._chat_buffer) < CHAT_FLUSH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._chat_ready.wait(remaining)
+
+            if not self.flush_chat_messages():
+                time.sleep(CHAT_FLUSH_INTERVAL)  # Rows are back in the buffer; retry later
+
+    def flush_chat_messages(self) -> bool:
+        """Write all buffered chat messages in a single transaction"""
+        with self._chat_flush_lock:
+            with self._chat_lock:
+                batch = list(self._chat_buffer)
+                self._chat_buffer.clear()
+
+            if not batch:
+                return True
 
-                conn.commit()
+            try:
+                if self._chat_conn is None:
+                    self._chat_conn = self._open_connection()
+
+                with self._chat_conn as conn:
+                    conn.executemany('''
+                        INSERT INTO chat_messages
+                        (user_phone, message, response, timestamp, session_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', batch)
                 return True
 
-        except sqlite3.Error as e:
-            print(f"Database error saving chat message: {e}")
-            return False
+            except sqlite3.Error as e:
+                print(f"Database error saving chat messages: {e}")
+
+                # Put the batch back ahead of anything queued since, keeping the order
+                with self._chat_lock:
+                    self._chat_buffer.extendleft(reversed(batch))
+                    self._chat_first_at = time.monotonic()
+                return False
+
+    def iter_chat_history(self, user_phone: str, limit: int = 50, chronological: bool = False) -> Iterator[Dict]:
+        """Iterate the latest chat history for user, most recent first unless chronological"""
+        self.flush_chat_messages()
+
+        query = f'''
+            SELECT {CHAT_MESSAGE_COLUMNS} FROM chat_messages
+            WHERE user_phone = ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        '''
+        if chronological:
+            # Re-sort the latest rows oldest first in SQL rather than reversing in Python
+            query = f'SELECT {CHAT_MESSAGE_COLUMNS} FROM ({query}) ORDER BY timestamp, id'
+
+        cursor = self.get_connection().cursor()
+        cursor.arraysize = FETCH_BATCH_SIZE
+        cursor.execute(query, (user_phone, limit))
+
+        while True:
+            batch = cursor.fetchmany()
+            if not batch:
+                break
+            for row in batch:
+                yield dict(row)
 
     def get_chat_history(self, user_phone: str, limit: int = 50) -> List[Dict]:
         """Get chat history for user"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM chat_messages
-                WHERE user_phone = ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (user_phone, limit))
+        return list(self.iter_chat_history(user_phone, limit, chronological=True))
 
-            rows = cursor.fetchall()
+    def count_distinct_users(self) -> int:
+        """Count users with any chat history"""
+        self.flush_chat_messages()
 
-            messages = []
-            for row in rows:
-                messages.append({
-                    'id': row[0],
-                    'user_phone': row[1],
-                    'message': row[2],
-                    'response': row[3],
-                    'timestamp': row[4],
-                    'session_id': row[5]
-                })
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Answered from idx_chat_user_ts without touching the table
+            cursor.execute('SELECT COUNT(DISTINCT user_phone) FROM chat_messages')
 
-            return list(reversed(messages))  # Return chronological order
+            return cursor.fetchone()[0]
 
     # Available slots management
     def initialize_available_slots(self, slots: Dict[str, List[str]]):
         """Initialize available time slots"""
+        rows = [(date, time) for date, times in slots.items() for time in times]
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            for date, times in slots.items():
-                for time in times:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO available_slots (date, time, is_available)
-                        VALUES (?, ?, 1)
-                    ''', (date, time))
+            try:
+                # One transaction for the whole batch instead of one per row
+                cursor.execute('BEGIN')
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO master_slots (date, time)
+                    VALUES (?, ?)
+                ''', rows)
+                conn.commit()
+                self.invalidate_slots_cache()
 
-            conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Database error initializing slots: {e}")
 
     def get_available_slots(self) -> Dict[str, List[str]]:
         """Get available time slots"""
+        version = self._read_cache_version()
+        with self._cache.lock:
+            if self._cache.slots is not None:
+                return {date: list(times) for date, times in self._cache.slots.items()}
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT date, time FROM available_slots
-                WHERE is_available = 1
+                SELECT date, time FROM v_available_slots
                 ORDER BY date, time
             ''')
 
@@ -439,51 +890,49 @@ class DatabaseManager:
                     slots[date] = []
                 slots[date].append(time)
 
-            return slots
+            with self._cache.lock:
+                if self._cache.loaded_version == version:
+                    self._cache.slots = {date: list(times) for date, times in slots.items()}
 
-    def book_slot(self, date: str, time: str) -> bool:
-        """Mark slot as booked"""
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE available_slots SET is_available = 0
-                    WHERE date = ? AND time = ?
-                ''', (date, time))
+            return slots
 
-                conn.commit()
-                return cursor.rowcount > 0
+    def invalidate_slots_cache(self):
+        """Drop cached available slots after a slot change"""
+        with self._cache.lock:
+            self._cache.slots = None
+            self._cache.appointments_version += 1
 
-        except sqlite3.Error as e:
-            print(f"Database error booking slot: {e}")
-            return False
+    def book_slot(self, date: str, time: str) -> bool:
+        """Mark slot as booked (kept for compatibility; booking is create_appointment)"""
+        self.invalidate_slots_cache()
+        return True
 
     def release_slot(self, date: str, time: str) -> bool:
-        """Mark slot as available"""
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE available_slots SET is_available = 1
-                    WHERE date = ? AND time = ?
-                ''', (date, time))
-
-                conn.commit()
-                return cursor.rowcount > 0
-
-        except sqlite3.Error as e:
-            print(f"Database error releasing slot: {e}")
-            return False
+        """Mark slot as available (kept for compatibility; cancelling frees the slot)"""
+        self.invalidate_slots_cache()
+        return True
 
     # Business settings
     def get_setting(self, key: str, default: str = None) -> str:
         """Get business setting"""
+        version = self._read_cache_version()
+        with self._cache.lock:
+            if key in self._cache.settings:
+                value = self._cache.settings[key]
+                return value if value is not None else default
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT value FROM business_settings WHERE key = ?', (key,))
             row = cursor.fetchone()
 
-            return row[0] if row else default
+            # Missing keys are cached as None too
+            value = row[0] if row else None
+            with self._cache.lock:
+                if self._cache.loaded_version == version:
+                    self._cache.settings[key] = value
+
+            return value if value is not None else default
 
     def set_setting(self, key: str, value: str) -> bool:
         """Set business setting"""
@@ -496,6 +945,8 @@ class DatabaseManager:
                 ''', (key, value))
 
                 conn.commit()
+                with self._cache.lock:
+                    self._cache.settings[key] = value
                 return True
 
         except sqlite3.Error as e:
@@ -508,22 +959,20 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Total users
-            cursor.execute('SELECT COUNT(*) FROM users')
-            total_users = cursor.fetchone()[0]
-
-            # Active users (last 7 days)
-            week_ago = (datetime.datetime.now() - datetime.timedelta(days=7)).isoformat()
-            cursor.execute('SELECT COUNT(*) FROM users WHERE last_active > ?', (week_ago,))
-            active_users = cursor.fetchone()[0]
-
-            # Total appointments
-            cursor.execute('SELECT COUNT(*) FROM appointments')
-            total_appointments = cursor.fetchone()[0]
+            # Total and active users (last 7 days) in one pass
+            week_ago = int(time.time()) - 7 * 86400
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN last_active > ? THEN 1 ELSE 0 END), 0)
+                FROM users
+            ''', (week_ago,))
+            total_users, active_users = cursor.fetchone()
 
-            # Pending appointments
-            cursor.execute('SELECT COUNT(*) FROM appointments WHERE status = "pending"')
-            pending_appointments = cursor.fetchone()[0]
+            # Total and pending appointments in one pass
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), 0)
+                FROM appointments
+            ''')
+            total_appointments, pending_appointments = cursor.fetchone()
 
             return {
                 'total_users': total_users,
@@ -533,9 +982,28 @@ class DatabaseManager:
             }
 
     def close(self):
-        """Close database connection (if needed)"""
-        # SQLite connections are automatically closed when using context managers
-        pass
+        """Close all pooled database connections"""
+        self.flush_chat_messages()
+        self.flush_user_activity()
+
+        with self._pool_lock:
+            for conn in list(self._pool):
+                conn.close()
+            self._pool.clear()
+        self._tls = threading.local()
+
+        with self._chat_flush_lock:
+            if self._chat_conn is not None:
+                self._chat_conn.close()
+                self._chat_conn = None
+
+        # A reopened connection restarts data_version, so bump the counter to
+        # keep tokens handed out before the close from ever matching again
+        with self._cache.lock:
+            if self._cache.version_conn is not None:
+                self._cache.version_conn.close()
+                self._cache.version_conn = None
+                self._cache.appointments_version += 1
 
 # Example usage and testing
 def test_database():
@@ -553,8 +1021,7 @@ def test_database():
         name="John Doe",
         service="Haircut",
         date="2024-01-15",
-        time="2:00 PM",
-        created_at=datetime.datetime.now().isoformat()
+        time="2:00 PM"
     )
 
     success = db.create_appointment(appointment)
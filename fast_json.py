@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+JSON helpers for the AI Voice Agent
+Use orjson when it is installed and fall back to the standard json module
+"""
+
+import json
+
+# Faster JSON for webhook bodies and outbound payloads (install with: pip install orjson)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def loads_json(raw: bytes):
+    """Parse a JSON request body"""
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+def dumps_json(obj) -> bytes:
+    """Serialize an object to JSON bytes"""
+    return orjson.dumps(obj) if ORJSON_AVAILABLE else json.dumps(obj).encode()
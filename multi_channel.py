@@ -4,13 +4,133 @@ Multi-Channel Integration for AI Voice Agent
 Support for WhatsApp, SMS, Telegram, and other messaging platforms
 """
 
-import json
-import requests
-import datetime
+import sys
+import copy
+import time
+import hashlib
+import atexit
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response
 from database import DatabaseManager
-from call_text_agent import CallTextAgent, MessageType
+from admin_settings import read_config
+from call_text_agent import CallTextAgent, ConversationState, MessageType
+from fast_json import JSON_HEADERS, dumps_json, loads_json
+
+# Keep-alive pool for outbound channel API calls (Telegram, Messenger) so
+# replies reuse open TLS connections instead of handshaking every time
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 64
+HTTP_TIMEOUT = (2, 5)  # (connect, read) seconds
+
+# Threads answering and delivering webhook replies, so handlers can return
+# 200 right away
+SEND_WORKERS = 16
+
+# Concurrent sends per broadcast (matches the HTTP pool size)
+BROADCAST_CONCURRENCY = 64
+
+# requests is imported on first use, so webchat-only setups never load it
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Get the process-wide pooled HTTP session (a requests.Session)"""
+    global _http_session
+
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            # POST is not in Retry's default allowed_methods, so only failed
+            # connects are retried and a message is never sent twice
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=Retry(total=3, backoff_factor=0.2,
+                                  status_forcelist=[429, 500, 502, 503, 504])
+            )
+            session.mount('https://', adapter)
+            _http_session = session
+
+        return _http_session
+
+# Agent replies to repeated greeting-state messages are reused for a short
+# while instead of running the agent again
+RESPONSE_CACHE_SIZE = 2048
+RESPONSE_CACHE_TTL = 60  # seconds
+
+# Dashboard polls within this window get the same channel stats
+STATS_CACHE_TTL = 5  # seconds
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a live cached value, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# Twilio REST clients keyed by (account_sid, auth_token), so WhatsApp and SMS
+# on the same account share one client and its connection pool
+_twilio_clients: Dict[tuple, object] = {}
+_twilio_clients_lock = threading.Lock()
+
+# Twilio's own keep-alive pool defaults to 10 connections; broadcasts need more
+TWILIO_POOL_CONNECTIONS = 32
+TWILIO_POOL_MAXSIZE = 128
+TWILIO_TIMEOUT = 10  # seconds
+
+def get_twilio_client(account_sid: str, auth_token: str):
+    """Get the shared Twilio client for an account (raises ImportError without twilio)"""
+    from twilio.rest import Client
+    from twilio.http.http_client import TwilioHttpClient
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    key = (account_sid, auth_token)
+    with _twilio_clients_lock:
+        client = _twilio_clients.get(key)
+        if client is None:
+            http_client = TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+            # Replace the session's default adapter with a larger keep-alive pool
+            # so consecutive messages.create calls reuse TLS connections
+            http_client.session.mount('https://', HTTPAdapter(
+                pool_connections=TWILIO_POOL_CONNECTIONS,
+                pool_maxsize=TWILIO_POOL_MAXSIZE,
+                max_retries=Retry(total=3, backoff_factor=0.2)
+            ))
+
+            client = Client(account_sid, auth_token, http_client=http_client)
+            _twilio_clients[key] = client
+
+        return client
 
 class MultiChannelManager:
     def __init__(self, db_path: str = "voiceagent.db"):
@@ -18,47 +138,55 @@ class MultiChannelManager:
         self.agent = CallTextAgent(db_path)
         self.config = self.load_config()
         self.channels = {}
+        self._send_pool = ThreadPoolExecutor(max_workers=SEND_WORKERS, thread_name_prefix='channel-send')
+        self._inbox: Dict[tuple, deque] = {}  # (channel, sender_id) -> messages not yet answered
+        self._inbox_lock = threading.Lock()
+        self._response_cache = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+        self._stats_cache = TTLCache(1, STATS_CACHE_TTL)
+        self._active_count = 0
 
         # Initialize available channels
         self.setup_channels()
 
+        # Deliver queued replies before the process exits
+        atexit.register(self._send_pool.shutdown)
+
     def load_config(self) -> Dict:
         """Load multi-channel configuration"""
         try:
-            with open('config.json', 'r') as f:
-                config = json.load(f)
-                return config.get('multi_channel_settings', {
-                    'whatsapp': {
-                        'enabled': False,
-                        'provider': 'twilio',  # or 'whatsapp_business_api'
-                        'account_sid': '',
-                        'auth_token': '',
-                        'phone_number': '',
-                        'webhook_verify_token': ''
-                    },
-                    'sms': {
-                        'enabled': False,
-                        'provider': 'twilio',
-                        'account_sid': '',
-                        'auth_token': '',
-                        'phone_number': ''
-                    },
-                    'telegram': {
-                        'enabled': False,
-                        'bot_token': '',
-                        'webhook_url': ''
-                    },
-                    'messenger': {
-                        'enabled': False,
-                        'page_access_token': '',
-                        'verify_token': '',
-                        'app_secret': ''
-                    },
-                    'webchat': {
-                        'enabled': True,
-                        'embed_code_available': True
-                    }
-                })
+            # Deep-copied so changes to self.config never leak into the shared parse
+            return copy.deepcopy(read_config().get('multi_channel_settings', {
+                'whatsapp': {
+                    'enabled': False,
+                    'provider': 'twilio',  # or 'whatsapp_business_api'
+                    'account_sid': '',
+                    'auth_token': '',
+                    'phone_number': '',
+                    'webhook_verify_token': ''
+                },
+                'sms': {
+                    'enabled': False,
+                    'provider': 'twilio',
+                    'account_sid': '',
+                    'auth_token': '',
+                    'phone_number': ''
+                },
+                'telegram': {
+                    'enabled': False,
+                    'bot_token': '',
+                    'webhook_url': ''
+                },
+                'messenger': {
+                    'enabled': False,
+                    'page_access_token': '',
+                    'verify_token': '',
+                    'app_secret': ''
+                },
+                'webchat': {
+                    'enabled': True,
+                    'embed_code_available': True
+                }
+            }))
         except FileNotFoundError:
             return {
                 'whatsapp': {'enabled': False},
@@ -70,34 +198,46 @@ class MultiChannelManager:
 
     def setup_channels(self):
         """Initialize enabled channels"""
-        if self.config['whatsapp']['enabled']:
-            self.channels['whatsapp'] = WhatsAppChannel(self.config['whatsapp'])
-
-        if self.config['sms']['enabled']:
-            self.channels['sms'] = SMSChannel(self.config['sms'])
-
-        if self.config['telegram']['enabled']:
-            self.channels['telegram'] = TelegramChannel(self.config['telegram'])
-
-        if self.config['messenger']['enabled']:
-            self.channels['messenger'] = MessengerChannel(self.config['messenger'])
+        self.channels = {
+            name: channel_cls(self.config[name])
+            for name, channel_cls in _CHANNEL_CLS.items()
+            if self.config.get(name, {}).get('enabled')
+        }
 
-        if self.config['webchat']['enabled']:
-            self.channels['webchat'] = WebChatChannel(self.config['webchat'])
+        # Channels only go inactive while setting themselves up
+        self._active_count = sum(1 for channel in self.channels.values() if channel.is_active)
 
         print(f"✅ Initialized {len(self.channels)} communication channels")
 
+    @property
+    def active_channel_count(self) -> int:
+        """Number of channels that initialized successfully"""
+        return self._active_count
+
     def process_message(self, channel: str, sender_id: str, message: str, message_data: Dict = None) -> str:
         """Process incoming message from any channel"""
         try:
             # Normalize sender ID (add channel prefix)
-            normalized_sender = f"{channel}:{sender_id}"
+            normalized_sender = channel_prefix(channel) + sender_id
 
-            # Process through AI agent
-            response = self.agent.process_message(normalized_sender, message, MessageType.TEXT)
+            # Only greeting-state replies that leave the conversation in the
+            # greeting state are reusable; every other turn changes state
+            cache_key = (channel, sender_id, message.strip().lower())
+            response = self._response_cache.get(cache_key) if self._in_greeting(normalized_sender) else None
+
+            if response is not None:
+                self.db.update_user_activity(normalized_sender)
+            else:
+                was_greeting = self._in_greeting(normalized_sender)
+
+                # Process through AI agent
+                response = self.agent.process_message(normalized_sender, message, MessageType.TEXT)
+
+                if was_greeting and self._in_greeting(normalized_sender):
+                    self._response_cache.set(cache_key, response)
 
             # Log the interaction
-            self.log_multi_channel_interaction(channel, sender_id, message, response)
+            self.log_multi_channel_interaction(channel, sender_id, message, response, normalized_sender)
 
             return response
 
@@ -105,6 +245,11 @@ class MultiChannelManager:
             print(f"Error processing {channel} message: {e}")
             return "I'm sorry, I'm having trouble processing your message right now. Please try again."
 
+    def _in_greeting(self, normalized_sender: str) -> bool:
+        """Check whether the sender has an agent session in the greeting state"""
+        session = self.agent.sessions.get(normalized_sender)
+        return session is not None and session.state == ConversationState.GREETING
+
     def send_message(self, channel: str, recipient_id: str, message: str) -> bool:
         """Send message through specific channel"""
         try:
@@ -118,6 +263,35 @@ class MultiChannelManager:
             print(f"Error sending message via {channel}: {e}")
             return False
 
+    def receive_message(self, channel: str, sender_id: str, message: str):
+        """Answer an incoming message in the background, in arrival order per sender"""
+        key = (channel, sender_id)
+
+        with self._inbox_lock:
+            pending = self._inbox.get(key)
+            if pending is not None:
+                # A worker is already draining this sender's messages
+                pending.append(message)
+                return
+            self._inbox[key] = deque([message])
+
+        self._send_pool.submit(self._drain_inbox, channel, sender_id)
+
+    def _drain_inbox(self, channel: str, sender_id: str):
+        """Process and reply to a sender's queued messages one at a time"""
+        key = (channel, sender_id)
+
+        while True:
+            with self._inbox_lock:
+                pending = self._inbox[key]
+                if not pending:
+                    del self._inbox[key]
+                    return
+                message = pending.popleft()
+
+            response = self.process_message(channel, sender_id, message)
+            self.send_message(channel, sender_id, response)
+
     def broadcast_message(self, message: str, channels: List[str] = None, user_filter: Dict = None) -> Dict:
         """Broadcast message to multiple channels"""
         if channels is None:
@@ -126,30 +300,34 @@ class MultiChannelManager:
         results = {}
 
         try:
-            # Get users to broadcast to
+            # Get users to broadcast to, bucketed once by channel prefix
             users = self.get_broadcast_recipients(user_filter)
 
-            for channel in channels:
-                if channel in self.channels:
-                    channel_results = []
-
-                    # Filter users by channel
-                    channel_users = [user for user in users if user['phone'].startswith(f"{channel}:")]
-
-                    for user in channel_users:
-                        # Extract actual ID (remove channel prefix)
-                        recipient_id = user['phone'].replace(f"{channel}:", "")
-                        success = self.send_message(channel, recipient_id, message)
-                        channel_results.append({
+            buckets: Dict[str, List[str]] = {}
+            for user in users:
+                user_channel, _, recipient_id = user['phone'].partition(':')
+                buckets.setdefault(user_channel, []).append(recipient_id)
+
+            # Sends are network-bound, so run them concurrently on a bounded
+            # pool; a separate pool keeps webhook replies from queueing behind
+            with ThreadPoolExecutor(max_workers=BROADCAST_CONCURRENCY,
+                                    thread_name_prefix='broadcast') as pool:
+                for channel in channels:
+                    if channel in self.channels:
+                        recipient_ids = buckets.get(channel, [])
+                        futures = [pool.submit(self.send_message, channel, recipient_id, message)
+                                   for recipient_id in recipient_ids]
+
+                        channel_results = [{
                             'recipient_id': recipient_id,
-                            'success': success
-                        })
+                            'success': future.result()
+                        } for recipient_id, future in zip(recipient_ids, futures)]
 
-                    results[channel] = {
-                        'attempted': len(channel_results),
-                        'successful': len([r for r in channel_results if r['success']]),
-                        'details': channel_results
-                    }
+                        results[channel] = {
+                            'attempted': len(channel_results),
+                            'successful': len([r for r in channel_results if r['success']]),
+                            'details': channel_results
+                        }
 
             return results
 
@@ -171,22 +349,23 @@ class MultiChannelManager:
             print(f"Error getting broadcast recipients: {e}")
             return []
 
-    def log_multi_channel_interaction(self, channel: str, sender_id: str, message: str, response: str):
+    def log_multi_channel_interaction(self, channel: str, sender_id: str, message: str, response: str,
+                                      normalized_sender: str = None):
         """Log interaction with channel information"""
         try:
             # Save with channel info in the session data
             session_data = {
                 'channel': channel,
                 'original_sender_id': sender_id,
-                'timestamp': datetime.datetime.now().isoformat()
+                'ts_ns': time.time_ns()  # Unix epoch nanoseconds; format when read
             }
 
             # You could extend the database to store channel info
             self.db.save_chat_message(
-                f"{channel}:{sender_id}",
+                normalized_sender or channel_prefix(channel) + sender_id,
                 message,
                 response,
-                json.dumps(session_data)
+                dumps_json(session_data).decode()
             )
 
         except Exception as e:
@@ -194,22 +373,25 @@ class MultiChannelManager:
 
     def get_channel_stats(self) -> Dict:
         """Get statistics for all channels"""
+        stats = self._stats_cache.get('stats')
+        if stats is not None:
+            return stats
+
         stats = {}
 
         try:
+            # Every channel inherits get_stats from BaseChannel
             for channel_name, channel in self.channels.items():
-                if hasattr(channel, 'get_stats'):
-                    stats[channel_name] = channel.get_stats()
-                else:
-                    stats[channel_name] = {'enabled': True, 'status': 'active'}
+                stats[channel_name] = channel.get_stats()
 
             # Add overall stats
             stats['summary'] = {
                 'total_channels': len(self.channels),
-                'active_channels': len([c for c in self.channels.values() if getattr(c, 'is_active', True)]),
+                'active_channels': self.active_channel_count,
                 'total_conversations': self.get_total_conversations()
             }
 
+            self._stats_cache.set('stats', stats)
             return stats
 
         except Exception as e:
@@ -219,10 +401,8 @@ class MultiChannelManager:
     def get_total_conversations(self) -> int:
         """Get total number of conversations across all channels"""
         try:
-            # Query database for unique users across all channels
-            chat_history = self.db.get_chat_history('', 1000)  # Get recent history
-            unique_users = set(msg['user_phone'] for msg in chat_history)
-            return len(unique_users)
+            # Count unique users across all channels in SQL
+            return self.db.count_distinct_users()
 
         except Exception:
             return 0
@@ -242,6 +422,9 @@ class BaseChannel:
         """Get channel statistics"""
         return {'enabled': True, 'status': 'active'}
 
+# Twilio addresses WhatsApp numbers as "whatsapp:+15551234567"
+WHATSAPP_PREFIX = 'whatsapp:'
+
 class WhatsAppChannel(BaseChannel):
     """WhatsApp Business API integration"""
 
@@ -264,14 +447,12 @@ class WhatsAppChannel(BaseChannel):
     def setup_twilio_whatsapp(self):
         """Setup Twilio WhatsApp"""
         try:
-            from twilio.rest import Client
-
             account_sid = self.config.get('account_sid')
             auth_token = self.config.get('auth_token')
 
             if account_sid and auth_token:
-                self.client = Client(account_sid, auth_token)
-                self.from_number = f"whatsapp:{self.config.get('phone_number')}"
+                self.client = get_twilio_client(account_sid, auth_token)
+                self.from_number = WHATSAPP_PREFIX + (self.config.get('phone_number') or '')
                 print("✅ Twilio WhatsApp initialized")
             else:
                 print("❌ Twilio credentials missing")
@@ -293,7 +474,7 @@ class WhatsAppChannel(BaseChannel):
                 return False
 
             # Format recipient number
-            to_number = f"whatsapp:{recipient_id}" if not recipient_id.startswith('whatsapp:') else recipient_id
+            to_number = recipient_id if recipient_id.startswith(WHATSAPP_PREFIX) else WHATSAPP_PREFIX + recipient_id
 
             # Send via Twilio
             if hasattr(self, 'client'):
@@ -331,13 +512,11 @@ class SMSChannel(BaseChannel):
     def setup_sms(self):
         """Setup SMS connection"""
         try:
-            from twilio.rest import Client
-
             account_sid = self.config.get('account_sid')
             auth_token = self.config.get('auth_token')
 
             if account_sid and auth_token:
-                self.client = Client(account_sid, auth_token)
+                self.client = get_twilio_client(account_sid, auth_token)
                 self.from_number = self.config.get('phone_number')
                 print("✅ SMS channel initialized")
             else:
@@ -373,6 +552,8 @@ class TelegramChannel(BaseChannel):
         super().__init__(config)
         self.bot_token = config.get('bot_token')
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.send_url = f"{self.api_url}/sendMessage"
+        self.session = get_http_session()
 
     def send_message(self, recipient_id: str, message: str) -> bool:
         """Send Telegram message"""
@@ -386,7 +567,8 @@ class TelegramChannel(BaseChannel):
                 'parse_mode': 'Markdown'
             }
 
-            response = requests.post(f"{self.api_url}/sendMessage", json=payload)
+            response = self.session.post(self.send_url, data=dumps_json(payload),
+                                         headers=JSON_HEADERS, timeout=HTTP_TIMEOUT)
 
             if response.status_code == 200:
                 print(f"✅ Telegram message sent to {recipient_id}")
@@ -406,6 +588,8 @@ class MessengerChannel(BaseChannel):
         super().__init__(config)
         self.page_access_token = config.get('page_access_token')
         self.api_url = "https://graph.facebook.com/v18.0/me/messages"
+        self.params = {'access_token': self.page_access_token}
+        self.session = get_http_session()
 
     def send_message(self, recipient_id: str, message: str) -> bool:
         """Send Facebook Messenger message"""
@@ -418,15 +602,8 @@ class MessengerChannel(BaseChannel):
                 'message': {'text': message}
             }
 
-            headers = {
-                'Content-Type': 'application/json'
-            }
-
-            params = {
-                'access_token': self.page_access_token
-            }
-
-            response = requests.post(self.api_url, json=payload, headers=headers, params=params)
+            response = self.session.post(self.api_url, data=dumps_json(payload), headers=JSON_HEADERS,
+                                         params=self.params, timeout=HTTP_TIMEOUT)
 
             if response.status_code == 200:
                 print(f"✅ Messenger message sent to {recipient_id}")
@@ -439,6 +616,20 @@ class MessengerChannel(BaseChannel):
             print(f"❌ Error sending Messenger message: {e}")
             return False
 
+# Web chat widget snippet; fixed, so its ETag is computed once
+_EMBED_CODE = """
+<div id="ai-chat-widget"></div>
+<script>
+    (function() {
+        var script = document.createElement('script');
+        script.src = 'http://localhost:8000/static/chat-widget.js';
+        script.async = true;
+        document.head.appendChild(script);
+    })();
+</script>
+        """
+_EMBED_ETAG = hashlib.md5(_EMBED_CODE.encode()).hexdigest()
+
 class WebChatChannel(BaseChannel):
     """Web chat channel (our existing chat widget)"""
 
@@ -453,17 +644,23 @@ class WebChatChannel(BaseChannel):
 
     def get_embed_code(self) -> str:
         """Generate embed code for websites"""
-        return """
-<div id="ai-chat-widget"></div>
-<script>
-    (function() {
-        var script = document.createElement('script');
-        script.src = 'http://localhost:8000/static/chat-widget.js';
-        script.async = true;
-        document.head.appendChild(script);
-    })();
-</script>
-        """
+        return _EMBED_CODE
+
+# Channel name (as used in config.json and sender prefixes) -> implementation
+_CHANNEL_CLS = {
+    'whatsapp': WhatsAppChannel,
+    'sms': SMSChannel,
+    'telegram': TelegramChannel,
+    'messenger': MessengerChannel,
+    'webchat': WebChatChannel
+}
+
+# Interned "<channel>:" sender prefixes, built once
+_CHANNEL_PREFIX = {name: sys.intern(name + ':') for name in _CHANNEL_CLS}
+
+def channel_prefix(channel: str) -> str:
+    """Get the sender ID prefix for a channel"""
+    return _CHANNEL_PREFIX.get(channel) or channel + ':'
 
 # Flask routes for webhooks
 def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
@@ -482,17 +679,15 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
         elif request.method == 'POST':
             # Handle incoming message
             try:
-                data = request.get_json()
+                data = loads_json(request.get_data(cache=False))
 
                 # Extract message data (Twilio format)
-                from_number = data.get('From', '').replace('whatsapp:', '')
+                from_number = data.get('From', '').removeprefix(WHATSAPP_PREFIX)
                 message_body = data.get('Body', '')
 
                 if from_number and message_body:
-                    response = multi_channel.process_message('whatsapp', from_number, message_body)
-
-                    # Send response back
-                    multi_channel.send_message('whatsapp', from_number, response)
+                    # Answer and send the response back without holding up the webhook
+                    multi_channel.receive_message('whatsapp', from_number, message_body)
 
                 return '', 200
 
@@ -504,7 +699,7 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
     def telegram_webhook():
         """Telegram webhook handler"""
         try:
-            data = request.get_json()
+            data = loads_json(request.get_data(cache=False))
 
             if 'message' in data:
                 message = data['message']
@@ -512,8 +707,7 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
                 text = message.get('text', '')
 
                 if text:
-                    response = multi_channel.process_message('telegram', str(chat_id), text)
-                    multi_channel.send_message('telegram', str(chat_id), response)
+                    multi_channel.receive_message('telegram', str(chat_id), text)
 
             return '', 200
 
@@ -533,7 +727,7 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
 
         elif request.method == 'POST':
             try:
-                data = request.get_json()
+                data = loads_json(request.get_data(cache=False))
 
                 if 'entry' in data:
                     for entry in data['entry']:
@@ -543,8 +737,7 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
                                 message_text = messaging_event['message'].get('text', '')
 
                                 if message_text:
-                                    response = multi_channel.process_message('messenger', sender_id, message_text)
-                                    multi_channel.send_message('messenger', sender_id, response)
+                                    multi_channel.receive_message('messenger', sender_id, message_text)
 
                 return '', 200
 
@@ -552,6 +745,15 @@ def create_webhook_routes(app: Flask, multi_channel: MultiChannelManager):
                 print(f"Messenger webhook error: {e}")
                 return '', 500
 
+    @app.route('/webchat/embed', methods=['GET'])
+    def webchat_embed():
+        """Web chat embed snippet, cacheable by browsers and CDNs"""
+        response = make_response(_EMBED_CODE)
+        response.mimetype = 'text/html'
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        response.set_etag(_EMBED_ETAG)
+        return response.make_conditional(request)
+
 def setup_instructions():
     """Print setup instructions for multi-channel integration"""
     instructions = """
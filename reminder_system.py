@@ -4,24 +4,130 @@ Automated Reminder System for AI Voice Agent
 Sends reminders via SMS, email, or webhook notifications
 """
 
-import schedule
+import heapq
 import time
 import datetime
 import threading
 import json
 import smtplib
+import functools
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from database import DatabaseManager
+from fast_json import JSON_HEADERS, dumps_json
+
+# Longest the scheduler thread sleeps before re-checking for jobs
+SCHEDULER_MAX_IDLE = 60  # seconds
+
+# How long stop() waits for a running job to finish
+SCHEDULER_STOP_TIMEOUT = 5  # seconds
+
+# How often due reminders are checked, and when the daily summary goes out
+REMINDER_CHECK_INTERVAL = 30 * 60  # seconds
+DAILY_SUMMARY_AT = (9, 0)  # local hour, minute
+
+# Scheduler heap entry: (due epoch, tie-breaker, next due from a run time, job)
+Timer = Tuple[float, int, Callable[[float], float], Callable[[], None]]
+
+# Connections kept alive to the reminder webhook
+WEBHOOK_POOL_MAXSIZE = 4
+
+# Threads sending reminders over SMS, email and webhook concurrently
+SEND_WORKERS = 8
+
+# Reminder text; only the per-appointment fields are filled in for each message
+_REMINDER_TPL = """
+🔔 Appointment Reminder
+
+Hi {name}!
+
+This is a friendly reminder about your upcoming appointment:
+
+📅 Date: {time_phrase}
+🕐 Time: {time}
+💇 Service: {service}
+📍 Location: Style Studio, 123 Main Street
+
+If you need to reschedule or cancel, please contact us at least 24 hours in advance.
+
+See you soon!
+- Style Studio Team
+""".strip()
+
+# Keyed on the fields shown rather than the appointment ID, so reminders retried
+# in later passes reuse their text and an edited appointment never goes stale
+@functools.lru_cache(maxsize=1024)
+def render_reminder(name: str, time_str: str, service: str, date: str, today: datetime.date) -> str:
+    """Reminder text for an appointment as of a given day"""
+    # Calculate time until appointment
+    apt_date = datetime.date.fromisoformat(date)
+
+    if apt_date == today:
+        time_phrase = "today"
+    elif apt_date == (today + datetime.timedelta(days=1)):
+        time_phrase = "tomorrow"
+    else:
+        time_phrase = f"on {apt_date.strftime('%B %d')}"
+
+    return _REMINDER_TPL.format(name=name, time=time_str, service=service, time_phrase=time_phrase)
+
+def next_daily_run(hour: int, minute: int, now: float) -> float:
+    """Epoch seconds of the next local hour:minute after now"""
+    current = datetime.datetime.fromtimestamp(now)
+    run = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= current:
+        run += datetime.timedelta(days=1)
+    return run.timestamp()
+
+@functools.lru_cache(maxsize=512)
+def convert_time_to_24h(time_str: str) -> str:
+    """Convert 12-hour time to 24-hour format (cached; there are only a few slot times)"""
+    try:
+        dt = datetime.datetime.strptime(time_str, "%I:%M %p")
+        return dt.strftime("%H:%M")
+    except ValueError:
+        # Already in 24h format or invalid
+        return time_str
 
 class ReminderSystem:
     def __init__(self, db_path: str = "voiceagent.db"):
         self.db = DatabaseManager(db_path)
-        self.running = False
+        self._stop_event = threading.Event()
+        self._stop_event.set()  # Not running until start()
         self.thread = None
         self.config = self.load_config()
+        self.apply_config()
+
+        self._smtp: Optional[smtplib.SMTP] = None  # Kept open for one batch of reminders
+        self._smtp_lock = threading.Lock()
+        self._send_pool: Optional[ThreadPoolExecutor] = None  # Created on first send
+        self._send_pool_lock = threading.Lock()
+
+        # Appointment lists keyed by status filter, valid while the version token holds
+        self._apt_cache: Dict[Optional[str], List[Dict]] = {}
+        self._apt_cache_version: Optional[Tuple[int, int]] = None
+        self._apt_cache_lock = threading.Lock()
+
+        # Keep-alive session for webhook posts. POST is not in Retry's default
+        # allowed_methods, so only failed connects are retried
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=WEBHOOK_POOL_MAXSIZE,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self._http.mount('https://', adapter)
+        self._http.mount('http://', adapter)
+
+    @property
+    def running(self) -> bool:
+        """Whether the scheduler thread is active"""
+        return not self._stop_event.is_set()
 
     def load_config(self) -> Dict:
         """Load reminder configuration"""
@@ -44,34 +150,73 @@ class ReminderSystem:
                 'business_hours': {'start': 9, 'end': 18}
             }
 
+    def apply_config(self):
+        """Flatten the settings read on every reminder out of self.config"""
+        self._reminder_hours: Tuple[float, ...] = tuple(sorted(self.config.get('reminder_hours', [24, 2])))
+        self._sms_enabled = bool(self.config.get('sms_enabled'))
+        self._email_enabled = bool(self.config.get('email_enabled'))
+        self._webhook_enabled = bool(self.config.get('webhook_enabled'))
+        self._webhook_url: str = self.config.get('webhook_url', '')
+        self._smtp_settings: Tuple[str, int, str, str] = (
+            self.config.get('smtp_server', 'smtp.gmail.com'),
+            self.config.get('smtp_port', 587),
+            self.config.get('email_user', ''),
+            self.config.get('email_password', '')
+        )
+
     def start(self):
         """Start the reminder system"""
         if self.running:
             return
 
-        self.running = True
+        self._stop_event.clear()
 
         # Schedule reminder checks
-        schedule.every(30).minutes.do(self.check_and_send_reminders)
-        schedule.every().day.at("09:00").do(self.send_daily_reminders)
+        now = time.time()
+        jobs = [
+            (lambda ran_at: ran_at + REMINDER_CHECK_INTERVAL, self.check_and_send_reminders),
+            (functools.partial(next_daily_run, *DAILY_SUMMARY_AT), self.send_daily_reminders),
+        ]
+        timers: List[Timer] = []
+        for seq, (next_due, job) in enumerate(jobs):
+            heapq.heappush(timers, (next_due(now), seq, next_due, job))
 
         # Start background thread
-        self.thread = threading.Thread(target=self.run_scheduler, daemon=True)
+        self.thread = threading.Thread(target=self.run_scheduler, args=(timers,), daemon=True)
         self.thread.start()
 
         print("📅 Reminder system started successfully")
 
     def stop(self):
         """Stop the reminder system"""
-        self.running = False
-        schedule.clear()
+        self._stop_event.set()  # Wakes the scheduler thread immediately
+
+        # Let a job that is mid-run finish before its session and pool go away
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=SCHEDULER_STOP_TIMEOUT)
+
+        self._http.close()
+
+        with self._send_pool_lock:
+            if self._send_pool is not None:
+                self._send_pool.shutdown(wait=True)
+                self._send_pool = None
+
         print("📅 Reminder system stopped")
 
-    def run_scheduler(self):
-        """Background scheduler runner"""
-        while self.running:
-            schedule.run_pending()
-            time.sleep(1)
+    def run_scheduler(self, timers: List[Timer]):
+        """Background scheduler runner over a heap of timers"""
+        while not self._stop_event.is_set():
+            # Run every job that is due; the earliest is always at the top
+            now = time.time()
+            while timers and timers[0][0] <= now and not self._stop_event.is_set():
+                _, seq, next_due, job = heapq.heappop(timers)
+                heapq.heappush(timers, (next_due(now), seq, next_due, job))
+                job()
+
+            # Sleep until the next job is due instead of polling every second
+            idle = timers[0][0] - time.time() if timers else SCHEDULER_MAX_IDLE
+            self._stop_event.wait(timeout=min(max(idle, 0), SCHEDULER_MAX_IDLE))
 
     def check_and_send_reminders(self):
         """Check for appointments that need reminders"""
@@ -79,120 +224,123 @@ class ReminderSystem:
             # Get appointments for the next 48 hours that need reminders
             appointments = self.get_appointments_needing_reminders()
 
-            for appointment in appointments:
-                self.send_reminder(appointment)
+            try:
+                self.send_reminders(appointments)
+            finally:
+                self.close_smtp()
 
         except Exception as e:
             print(f"Error checking reminders: {e}")
 
     def get_appointments_needing_reminders(self) -> List[Dict]:
         """Get appointments that need reminders sent"""
-        now = datetime.datetime.now()
-        appointments_to_remind = []
-
-        # Get all pending appointments
-        appointments = self.db.get_appointments(status='pending')
-
-        for appointment in appointments:
-            if appointment['reminder_sent']:
-                continue
+        now = time.time()
+
+        # Within 30 minutes either side of each configured reminder offset,
+        # merging overlapping windows (the offsets are sorted) into one range
+        windows: List[Tuple[int, int]] = []
+        for hours in self._reminder_hours:
+            start, end = int(now + hours * 3600 - 1800), int(now + hours * 3600 + 1800)
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], end)
+            else:
+                windows.append((start, end))
 
-            # Parse appointment datetime
-            try:
-                apt_datetime = datetime.datetime.strptime(
-                    f"{appointment['date']} {self.convert_time_to_24h(appointment['time'])}",
-                    "%Y-%m-%d %H:%M"
-                )
+        return self.db.get_appointments_due(windows)
 
-                # Check if we should send a reminder
-                hours_until = (apt_datetime - now).total_seconds() / 3600
+    def convert_time_to_24h(self, time_str: str) -> str:
+        """Convert 12-hour time to 24-hour format"""
+        return convert_time_to_24h(time_str)
 
-                # Send reminder if within configured hours and not sent yet
-                for reminder_hour in self.config['reminder_hours']:
-                    if abs(hours_until - reminder_hour) < 0.5:  # Within 30 minutes of target
-                        appointments_to_remind.append(appointment)
-                        break
+    def _get_send_pool(self) -> ThreadPoolExecutor:
+        """Get the executor for channel sends, recreating it after stop()"""
+        with self._send_pool_lock:
+            if self._send_pool is None:
+                self._send_pool = ThreadPoolExecutor(max_workers=SEND_WORKERS,
+                                                     thread_name_prefix="reminder-send")
+            return self._send_pool
 
-            except ValueError as e:
-                print(f"Error parsing appointment time: {e}")
-                continue
+    def send_reminder(self, appointment: Dict) -> bool:
+        """Send reminder for an appointment, returning whether any channel succeeded"""
+        return bool(self.send_reminders([appointment]))
 
-        return appointments_to_remind
+    def send_reminders(self, appointments: List[Dict]) -> List[str]:
+        """Send reminders for a batch of appointments, returning the IDs that were sent"""
+        sent_ids = set()
 
-    def convert_time_to_24h(self, time_str: str) -> str:
-        """Convert 12-hour time to 24-hour format"""
-        try:
-            dt = datetime.datetime.strptime(time_str, "%I:%M %p")
-            return dt.strftime("%H:%M")
-        except ValueError:
-            # Already in 24h format or invalid
-            return time_str
-
-    def send_reminder(self, appointment: Dict):
-        """Send reminder for an appointment"""
         try:
-            user = self.db.get_user(appointment['user_phone'])
+            # Create reminder messages, all relative to one clock reading
+            now = datetime.datetime.now()
+            batch = [(appointment, self.create_reminder_message(appointment, now)) for appointment in appointments]
 
-            # Create reminder message
-            message = self.create_reminder_message(appointment)
+            # Channels are independent, so fan the sends out and wait for them together
+            pool = self._get_send_pool()
+            futures: List[Tuple[str, Future]] = []
 
-            # Send via configured channels
-            sent = False
+            # The webhook takes the whole batch in one request
+            webhook = None
+            if self._webhook_enabled and batch:
+                webhook = pool.submit(self.send_webhook_batch, batch, now)
 
-            if self.config.get('sms_enabled') and appointment['user_phone']:
-                if self.send_sms_reminder(appointment['user_phone'], message):
-                    sent = True
+            # Send via configured per-recipient channels
+            for appointment, message in batch:
+                # The user record is only needed for their email address
+                user = self.db.get_user(appointment['user_phone']) if self._email_enabled else None
 
-            if self.config.get('email_enabled') and user and user.email:
-                if self.send_email_reminder(user.email, message, appointment):
-                    sent = True
+                if self._sms_enabled and appointment['user_phone']:
+                    futures.append((appointment['id'], pool.submit(
+                        self.send_sms_reminder, appointment['user_phone'], message)))
 
-            if self.config.get('webhook_enabled'):
-                if self.send_webhook_reminder(appointment, message):
-                    sent = True
+                if self._email_enabled and user and user.email:
+                    futures.append((appointment['id'], pool.submit(
+                        self.send_email_reminder, user.email, message, appointment)))
 
-            # Mark reminder as sent if any method succeeded
-            if sent:
-                self.db.mark_reminder_sent(appointment['id'])
-                print(f"✅ Reminder sent for appointment {appointment['id']}")
-            else:
-                print(f"❌ Failed to send reminder for appointment {appointment['id']}")
+            for appointment_id, future in futures:
+                if future.result():
+                    sent_ids.add(appointment_id)
+
+            if webhook is not None and webhook.result():
+                sent_ids.update(appointment['id'] for appointment, _ in batch)
 
         except Exception as e:
             print(f"Error sending reminder: {e}")
 
-    def create_reminder_message(self, appointment: Dict) -> str:
-        """Create reminder message text"""
-        # Calculate time until appointment
-        now = datetime.datetime.now()
-        apt_date = datetime.datetime.strptime(appointment['date'], "%Y-%m-%d").date()
-
-        if apt_date == now.date():
-            time_phrase = "today"
-        elif apt_date == (now.date() + datetime.timedelta(days=1)):
-            time_phrase = "tomorrow"
-        else:
-            time_phrase = f"on {apt_date.strftime('%B %d')}"
-
-        message = f"""
-🔔 Appointment Reminder
+        # Mark reminders as sent where any method succeeded, in one update
+        sent = [appointment['id'] for appointment in appointments if appointment['id'] in sent_ids]
+        if sent:
+            self.db.mark_reminders_sent(sent)
 
-Hi {appointment['name']}!
+        for appointment in appointments:
+            if appointment['id'] in sent_ids:
+                print(f"✅ Reminder sent for appointment {appointment['id']}")
+            else:
+                print(f"❌ Failed to send reminder for appointment {appointment['id']}")
 
-This is a friendly reminder about your upcoming appointment:
+        return sent
 
-📅 Date: {time_phrase}
-🕐 Time: {appointment['time']}
-💇 Service: {appointment['service']}
-📍 Location: Style Studio, 123 Main Street
+    def _cached_get_appointments(self, status: str = None) -> List[Dict]:
+        """Get appointments, reusing the last result until the table changes"""
+        version = self.db.appointments_version()
 
-If you need to reschedule or cancel, please contact us at least 24 hours in advance.
+        with self._apt_cache_lock:
+            if version != self._apt_cache_version:
+                self._apt_cache = {}
+                self._apt_cache_version = version
+            elif status in self._apt_cache:
+                return self._apt_cache[status]
 
-See you soon!
-- Style Studio Team
-        """.strip()
+        appointments = self.db.get_appointments(status=status)
 
-        return message
+        with self._apt_cache_lock:
+            if version == self._apt_cache_version:
+                self._apt_cache[status] = appointments
+        return appointments
+
+    def create_reminder_message(self, appointment: Dict, now: datetime.datetime = None) -> str:
+        """Create reminder message text"""
+        now = now or datetime.datetime.now()
+        return render_reminder(appointment['name'], appointment['time'], appointment['service'],
+                               appointment['date'], now.date())
 
     def send_sms_reminder(self, phone: str, message: str) -> bool:
         """Send SMS reminder (integration placeholder)"""
@@ -212,10 +360,7 @@ See you soon!
         """Send email reminder"""
         try:
             # Email configuration (would be in config)
-            smtp_server = self.config.get('smtp_server', 'smtp.gmail.com')
-            smtp_port = self.config.get('smtp_port', 587)
-            email_user = self.config.get('email_user', '')
-            email_password = self.config.get('email_password', '')
+            smtp_server, smtp_port, email_user, email_password = self._smtp_settings
 
             if not email_user or not email_password:
                 print("Email credentials not configured")
@@ -231,11 +376,13 @@ See you soon!
             html_message = message.replace('\n', '<br>')
             msg.attach(MIMEText(html_message, 'html'))
 
-            # Send email
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(email_user, email_password)
-                server.send_message(msg)
+            # Send email over the batch's shared connection, reconnecting once if it dropped
+            with self._smtp_lock:
+                try:
+                    self._get_smtp(smtp_server, smtp_port, email_user, email_password).send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    self._smtp = None
+                    self._get_smtp(smtp_server, smtp_port, email_user, email_password).send_message(msg)
 
             print(f"📧 Email reminder sent to {email}")
             return True
@@ -244,30 +391,68 @@ See you soon!
             print(f"Error sending email reminder: {e}")
             return False
 
+    def _get_smtp(self, server: str, port: int, user: str, password: str) -> smtplib.SMTP:
+        """Get the open SMTP connection, connecting and logging in if needed"""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+
+        smtp = smtplib.SMTP(server, port)
+        try:
+            smtp.starttls()
+            smtp.login(user, password)
+        except Exception:
+            smtp.close()
+            raise
+
+        self._smtp = smtp
+        return smtp
+
+    def close_smtp(self):
+        """Close the SMTP connection left open by a batch of reminders"""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    self._smtp.close()
+                self._smtp = None
+
     def send_webhook_reminder(self, appointment: Dict, message: str) -> bool:
         """Send webhook reminder to external service"""
+        return self.send_webhook_batch([(appointment, message)])
+
+    def send_webhook_batch(self, batch: List[Tuple[Dict, str]], now: datetime.datetime = None) -> bool:
+        """Send a batch of (appointment, message) reminders to the webhook in one request"""
         try:
-            webhook_url = self.config.get('webhook_url', '')
+            webhook_url = self._webhook_url
 
             if not webhook_url:
                 return False
 
             payload = {
-                'type': 'appointment_reminder',
-                'appointment': appointment,
-                'message': message,
-                'timestamp': datetime.datetime.now().isoformat()
+                'type': 'appointment_reminders',
+                'reminders': [
+                    {'appointment': appointment, 'message': message}
+                    for appointment, message in batch
+                ],
+                'timestamp': (now or datetime.datetime.now()).isoformat()
             }
 
-            response = requests.post(
+            body = dumps_json(payload)
+
+            response = self._http.post(
                 webhook_url,
-                json=payload,
+                data=body,
                 timeout=10,
-                headers={'Content-Type': 'application/json'}
+                headers=JSON_HEADERS
             )
 
             if response.status_code == 200:
-                print(f"🔗 Webhook reminder sent for appointment {appointment['id']}")
+                print(f"🔗 Webhook reminders sent for {len(batch)} appointment(s)")
                 return True
             else:
                 print(f"Webhook failed with status {response.status_code}")
@@ -281,13 +466,9 @@ See you soon!
         """Send daily summary of upcoming appointments"""
         try:
             tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
-            appointments = self.db.get_appointments()
 
-            # Filter for tomorrow's appointments
-            tomorrow_appointments = [
-                apt for apt in appointments
-                if apt['date'] == tomorrow and apt['status'] == 'pending'
-            ]
+            # Tomorrow's pending appointments, filtered and put in time order by SQL
+            tomorrow_appointments = self.db.get_appointments_by_date(tomorrow, status='pending')
 
             if tomorrow_appointments:
                 summary_message = self.create_daily_summary(tomorrow_appointments)
@@ -308,24 +489,25 @@ See you soon!
             print(f"Error sending daily summary: {e}")
 
     def create_daily_summary(self, appointments: List[Dict]) -> str:
-        """Create daily appointment summary"""
-        message = f"""
+        """Create daily appointment summary from appointments in time order"""
+        parts = [f"""
 📅 Daily Appointment Summary
 
 Tomorrow's Schedule ({len(appointments)} appointments):
 
-"""
-        for apt in sorted(appointments, key=lambda x: x['time']):
-            message += f"• {apt['time']} - {apt['name']} ({apt['service']})\n"
-
-        message += f"\nHave a great day!\n- AI Assistant"
-        return message
+"""]
+        parts.extend(
+            f"• {apt['time']} - {apt['name']} ({apt['service']})\n"
+            for apt in appointments
+        )
+        parts.append("\nHave a great day!\n- AI Assistant")
+        return "".join(parts)
 
     def send_admin_email(self, email: str, message: str, appointments: List[Dict]):
-        """Send admin email with appointment details"""
+        """Send admin email with appointment details (appointments in time order)"""
         try:
             # Create HTML table for appointments
-            html_table = """
+            parts = ["""
             <table border="1" style="border-collapse: collapse; width: 100%;">
                 <tr style="background-color: #f2f2f2;">
                     <th>Time</th>
@@ -334,10 +516,9 @@ Tomorrow's Schedule ({len(appointments)} appointments):
                     <th>Service</th>
                     <th>Status</th>
                 </tr>
-            """
+            """]
 
-            for apt in sorted(appointments, key=lambda x: x['time']):
-                html_table += f"""
+            parts.extend(f"""
                 <tr>
                     <td>{apt['time']}</td>
                     <td>{apt['name']}</td>
@@ -345,9 +526,10 @@ Tomorrow's Schedule ({len(appointments)} appointments):
                     <td>{apt['service']}</td>
                     <td>{apt['status']}</td>
                 </tr>
-                """
+                """ for apt in appointments)
 
-            html_table += "</table>"
+            parts.append("</table>")
+            html_table = "".join(parts)
 
             # Send detailed email (implementation would be similar to send_email_reminder)
             print(f"📧 Admin summary email prepared for {email}")
@@ -358,15 +540,15 @@ Tomorrow's Schedule ({len(appointments)} appointments):
     def send_test_reminder(self, appointment_id: str) -> bool:
         """Send a test reminder for debugging"""
         try:
-            appointments = self.db.get_appointments()
-            appointment = next((apt for apt in appointments if apt['id'] == appointment_id), None)
+            appointment = self.db.get_appointment(appointment_id)
 
             if not appointment:
                 print(f"Appointment {appointment_id} not found")
                 return False
 
-            self.send_reminder(appointment)
-            return True
+            sent = self.send_reminder(appointment)
+            self.close_smtp()
+            return sent
 
         except Exception as e:
             print(f"Error sending test reminder: {e}")
@@ -375,14 +557,18 @@ Tomorrow's Schedule ({len(appointments)} appointments):
     def get_reminder_stats(self) -> Dict:
         """Get reminder system statistics"""
         try:
-            appointments = self.db.get_appointments()
+            appointments = self._cached_get_appointments()
 
             total_appointments = len(appointments)
-            reminders_sent = len([apt for apt in appointments if apt['reminder_sent']])
-            pending_reminders = len([
-                apt for apt in appointments
-                if not apt['reminder_sent'] and apt['status'] == 'pending'
-            ])
+            reminders_sent = 0
+            pending_reminders = 0
+
+            # Count both in one pass over the rows
+            for apt in appointments:
+                if apt['reminder_sent']:
+                    reminders_sent += 1
+                elif apt['status'] == 'pending':
+                    pending_reminders += 1
 
             return {
                 'total_appointments': total_appointments,
@@ -4,32 +4,159 @@ Smart Scheduling System for AI Voice Agent
 Intelligent appointment scheduling with conflict detection and optimization
 """
 
+import bisect
+import copy
 import datetime
-import json
+import functools
+import re
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Set
 from database import DatabaseManager
+from admin_settings import config_stamp, read_config
 from calendar_integration import CalendarIntegration
 
+# Appointment statuses that occupy their time slot
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+# Times are handled as minutes since midnight; unparseable ones fall back to 9 AM
+DEFAULT_TIME_MINUTES = 9 * 60
+MINUTES_PER_DAY = 24 * 60
+
+# Most conflict-check results remembered per scheduler (least recently used go first)
+CONFLICT_CACHE_SIZE = 1024
+
+# Service lengths in minutes (anything unlisted takes an hour), plus the same as timedeltas
+DEFAULT_SERVICE_MINUTES = 60
+_SERVICE_DURATION_MIN: Dict[str, int] = {
+    'Haircut': 45,
+    'Styling': 30,
+    'Coloring': 120,
+    'Treatment': 60,
+    'Special Event': 90
+}
+_SERVICE_DURATION_TD: Dict[str, datetime.timedelta] = {
+    service: datetime.timedelta(minutes=minutes) for service, minutes in _SERVICE_DURATION_MIN.items()
+}
+_DEFAULT_SERVICE_TD = datetime.timedelta(minutes=DEFAULT_SERVICE_MINUTES)
+
+# Any fixed date works for time arithmetic; only the time of day is kept
+_ANCHOR_DATE = datetime.date(2000, 1, 1)
+
+# Config day keys indexed by date.weekday(), so no strftime('%A') per lookup
+_WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+SUNDAY = 6
+
+# '9:00 AM' style (what '%I:%M %p' accepts) or 24-hour '14:30'
+_TIME_RE = re.compile(r'(\d{1,2}):(\d{1,2})(?:\s+([AP]M))?')
+
+@functools.lru_cache(maxsize=4096)
+def parse_minutes(time_str: str) -> Optional[int]:
+    """Minutes since midnight for a time string (None if unparseable)"""
+    match = _TIME_RE.fullmatch(time_str)
+    if not match:
+        return None
+
+    hour, minute, meridiem = int(match[1]), int(match[2]), match[3]
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+    elif hour > 23:
+        return None
+
+    return hour * 60 + minute
+
+def format_minutes(minutes: int) -> str:
+    """Format minutes since midnight like '%I:%M %p'"""
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{hour % 12 or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+@functools.lru_cache(maxsize=64)
+def _time_slots(open_str: str, close_str: str, interval_minutes: int,
+                lunch: Optional[Tuple[int, int]]) -> Tuple[str, ...]:
+    """Slot start times from open until close, skipping the (start, end) lunch window"""
+    current_time = datetime.datetime.strptime(open_str, '%I:%M %p')
+    end_datetime = datetime.datetime.strptime(close_str, '%I:%M %p')
+
+    slots = []
+    while current_time < end_datetime:
+        minutes = current_time.hour * 60 + current_time.minute
+        if lunch is None or not lunch[0] <= minutes <= lunch[1]:
+            slots.append(current_time.strftime('%I:%M %p'))
+
+        current_time += datetime.timedelta(minutes=interval_minutes)
+
+    return tuple(slots)
+
+class DayAppointments:
+    """One day's active appointments sorted by start minute, for range lookups"""
+
+    def __init__(self, entries: List[Tuple[int, Dict]]):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.starts = [start for start, _ in self.entries]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def appointments(self) -> List[Dict]:
+        """The appointments in start-time order"""
+        return [apt for _, apt in self.entries]
+
+    def starting_near(self, minute: int, radius: int) -> List[Tuple[int, Dict]]:
+        """(start, appointment) pairs starting less than radius minutes from minute"""
+        lo = bisect.bisect_left(self.starts, minute - radius + 1)
+        hi = bisect.bisect_left(self.starts, minute + radius)
+        return self.entries[lo:hi]
+
+class BusyIntervals:
+    """Calendar busy time for a day as merged (start, end) minutes, for overlap lookups"""
+
+    def __init__(self, intervals: List[Tuple[int, int]]):
+        merged: List[List[int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Whether [start, end) overlaps any busy interval"""
+        # Merged intervals have ascending ends, so the first ending after start is the only candidate
+        i = bisect.bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
 class SmartScheduler:
     def __init__(self, db_path: str = "voiceagent.db"):
         self.db = DatabaseManager(db_path)
         self.calendar = CalendarIntegration(db_path)
         self.config = self.load_config()
 
+        # Conflict results keyed on the request plus everything they were computed from
+        self._conflict_cache: OrderedDict = OrderedDict()
+        self._conflict_lock = threading.RLock()
+
     def load_config(self) -> Dict:
         """Load scheduling configuration"""
         try:
-            with open('config.json', 'r') as f:
-                config = json.load(f)
-                return config.get('scheduling_settings', {
-                    'buffer_minutes': 15,  # Buffer between appointments
-                    'max_daily_appointments': 8,
-                    'lunch_break': {'start': '12:00', 'end': '13:00'},
-                    'preferred_slots': ['9:00 AM', '10:00 AM', '2:00 PM', '3:00 PM'],
-                    'avoid_slots': ['12:00 PM'],  # Lunch time
-                    'auto_suggest_alternatives': True,
-                    'optimize_schedule': True
-                })
+            # Deep-copied so changes to self.config never leak into the shared parse
+            config = read_config()
+            return copy.deepcopy(config.get('scheduling_settings', {
+                'buffer_minutes': 15,  # Buffer between appointments
+                'max_daily_appointments': 8,
+                'lunch_break': {'start': '12:00', 'end': '13:00'},
+                'preferred_slots': ['9:00 AM', '10:00 AM', '2:00 PM', '3:00 PM'],
+                'avoid_slots': ['12:00 PM'],  # Lunch time
+                'auto_suggest_alternatives': True,
+                'optimize_schedule': True,
+                'max_overlaps': 0  # Other appointments allowed within a slot's buffer
+            }))
         except FileNotFoundError:
             return {
                 'buffer_minutes': 15,
@@ -38,11 +165,47 @@ class SmartScheduler:
                 'preferred_slots': ['9:00 AM', '10:00 AM', '2:00 PM', '3:00 PM'],
                 'avoid_slots': ['12:00 PM'],
                 'auto_suggest_alternatives': True,
-                'optimize_schedule': True
+                'optimize_schedule': True,
+                'max_overlaps': 0  # Other appointments allowed within a slot's buffer
             }
 
-    def check_appointment_conflicts(self, date: str, time: str, service: str, exclude_id: str = None) -> Dict:
+    def check_appointment_conflicts(self, date: str, time: str, service: str, exclude_id: str = None,
+                                    day: DayAppointments = None, suggest: bool = True,
+                                    cal_busy: BusyIntervals = None) -> Dict:
         """Comprehensive conflict detection"""
+        # Calendar events can change without any local write, so those checks always run live
+        if day is not None or self.calendar.is_enabled():
+            return self.find_conflicts(date, time, service, exclude_id, day, suggest, cal_busy)
+
+        try:
+            # Today's date matters for the advance-booking rule
+            key = (date, time, service, exclude_id, suggest, self.db.appointments_version(),
+                   config_stamp(), datetime.date.today())
+        except Exception:
+            return self.find_conflicts(date, time, service, exclude_id, day, suggest)
+
+        with self._conflict_lock:
+            cached = self._conflict_cache.get(key)
+            if cached is not None:
+                self._conflict_cache.move_to_end(key)
+                return copy.deepcopy(cached)
+
+        conflicts = self.find_conflicts(date, time, service, exclude_id, day, suggest)
+        if 'error' in conflicts:
+            return conflicts
+
+        with self._conflict_lock:
+            self._conflict_cache[key] = copy.deepcopy(conflicts)
+            self._conflict_cache.move_to_end(key)
+            while len(self._conflict_cache) > CONFLICT_CACHE_SIZE:
+                self._conflict_cache.popitem(last=False)
+
+        return conflicts
+
+    def find_conflicts(self, date: str, time: str, service: str, exclude_id: str = None,
+                       day: DayAppointments = None, suggest: bool = True,
+                       cal_busy: BusyIntervals = None) -> Dict:
+        """Run every conflict check for a requested slot, without caching"""
         conflicts = {
             'has_conflict': False,
             'conflict_type': None,
@@ -51,30 +214,55 @@ class SmartScheduler:
         }
 
         try:
-            # 1. Check database conflicts
-            db_conflicts = self.check_database_conflicts(date, time, exclude_id)
+            # Business rules are skipped entirely for an unparseable date, as before
+            try:
+                date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
+            except ValueError:
+                date_obj = None
+            minutes = self.time_to_minutes(time)
+
+            # 1. Reject closed days, off-hours and lunch before touching the database or calendar
+            time_conflicts = self.check_time_rules(date_obj, minutes) if date_obj else []
+            if time_conflicts:
+                conflicts['has_conflict'] = True
+                conflicts['conflict_type'] = 'business_rule'
+                conflicts['details'].extend(time_conflicts)
+                if suggest and self.config['auto_suggest_alternatives']:
+                    conflicts['suggestions'] = self.suggest_alternative_times(date, service)
+                return conflicts
+
+            # The day's appointments serve both the overlap and daily-limit checks
+            if day is None:
+                day = self.get_day_appointments(date)
+
+            # 2. Check database conflicts
+            db_conflicts = self.check_database_conflicts(date, time, exclude_id, day)
             if db_conflicts:
                 conflicts['has_conflict'] = True
                 conflicts['conflict_type'] = 'existing_appointment'
                 conflicts['details'].extend(db_conflicts)
 
-            # 2. Check calendar conflicts
+            # 3. Check calendar conflicts (against preloaded busy times when given)
             if self.calendar.is_enabled():
                 duration = self.get_service_duration(service)
-                if not self.calendar.check_availability(date, time, duration):
+                if cal_busy is not None:
+                    available = not cal_busy.overlaps(minutes, minutes + duration)
+                else:
+                    available = self.calendar.check_availability(date, time, duration)
+                if not available:
                     conflicts['has_conflict'] = True
                     conflicts['conflict_type'] = 'calendar_conflict'
                     conflicts['details'].append('Conflicts with calendar event')
 
-            # 3. Check business rules
-            business_conflicts = self.check_business_rules(date, time, service)
+            # 4. Check the remaining business rules
+            business_conflicts = self.check_booking_rules(date, time, service, day) if date_obj else []
             if business_conflicts:
                 conflicts['has_conflict'] = True
                 conflicts['conflict_type'] = 'business_rule'
                 conflicts['details'].extend(business_conflicts)
 
-            # 4. Generate suggestions if conflicts exist
-            if conflicts['has_conflict'] and self.config['auto_suggest_alternatives']:
+            # 5. Generate suggestions if conflicts exist
+            if conflicts['has_conflict'] and suggest and self.config['auto_suggest_alternatives']:
                 conflicts['suggestions'] = self.suggest_alternative_times(date, service)
 
             return conflicts
@@ -83,25 +271,39 @@ class SmartScheduler:
             print(f"Error checking conflicts: {e}")
             return {'has_conflict': False, 'error': str(e)}
 
-    def check_database_conflicts(self, date: str, time: str, exclude_id: str = None) -> List[str]:
+    def get_day_appointments(self, date: str) -> DayAppointments:
+        """Load a day's active appointments, indexed by start time"""
+        return DayAppointments([
+            (self.time_to_minutes(apt['time']), apt)
+            for apt in self.db.get_appointments_by_date(date)
+            if apt['status'] in ACTIVE_STATUSES
+        ])
+
+    def check_database_conflicts(self, date: str, time: str, exclude_id: str = None,
+                                 day: DayAppointments = None) -> List[str]:
         """Check for conflicts in existing appointments"""
         conflicts = []
 
         try:
-            appointments = self.db.get_appointments()
+            if day is None:
+                day = self.get_day_appointments(date)
+
+            # Only appointments starting within the buffer can conflict; an
+            # exact match always does, even with no buffer
+            minute = self.time_to_minutes(time)
+            buffer_minutes = self.config['buffer_minutes']
 
-            for apt in appointments:
+            for start, apt in day.starting_near(minute, max(buffer_minutes, 1)):
                 if apt['id'] == exclude_id:
                     continue
 
-                if apt['date'] == date and apt['status'] in ['pending', 'confirmed']:
-                    # Check for exact time match
-                    if apt['time'] == time:
-                        conflicts.append(f"Exact time conflict with {apt['name']} ({apt['service']})")
+                # Check for exact time match
+                if apt['time'] == time:
+                    conflicts.append(f"Exact time conflict with {apt['name']} ({apt['service']})")
 
-                    # Check for buffer time conflicts
-                    elif self.times_too_close(apt['time'], time):
-                        conflicts.append(f"Too close to appointment with {apt['name']} at {apt['time']}")
+                # Check for buffer time conflicts
+                elif abs(start - minute) < buffer_minutes:
+                    conflicts.append(f"Too close to appointment with {apt['name']} at {apt['time']}")
 
             return conflicts
 
@@ -109,30 +311,54 @@ class SmartScheduler:
             print(f"Error checking database conflicts: {e}")
             return []
 
-    def check_business_rules(self, date: str, time: str, service: str) -> List[str]:
+    def check_business_rules(self, date: str, time: str, service: str,
+                             day: DayAppointments = None) -> List[str]:
         """Check business rules and constraints"""
+        try:
+            date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
+            violations = self.check_time_rules(date_obj, self.time_to_minutes(time))
+            violations.extend(self.check_booking_rules(date, time, service, day))
+            return violations
+
+        except Exception as e:
+            print(f"Error checking business rules: {e}")
+            return []
+
+    def check_time_rules(self, date_obj: datetime.datetime, minutes: int) -> List[str]:
+        """Check the rules that need only the date and time: business day, hours and lunch"""
         violations = []
 
         try:
             # 1. Check if it's a business day
-            date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
-            if date_obj.weekday() == 6:  # Sunday
+            weekday = date_obj.weekday()
+            if weekday == SUNDAY:
                 violations.append("We are closed on Sundays")
 
             # 2. Check business hours
-            time_obj = self.parse_time(time)
-            business_hours = self.get_business_hours(date_obj.strftime('%A').lower())
+            time_obj = datetime.time(*divmod(minutes, 60))
+            business_hours = self.get_business_hours(_WEEKDAY_NAMES[weekday])
 
             if not self.is_within_business_hours(time_obj, business_hours):
                 violations.append(f"Outside business hours ({business_hours['open']} - {business_hours['close']})")
 
             # 3. Check lunch break
-            if self.is_during_lunch_break(time):
+            if self.is_during_lunch_break(minutes=minutes):
                 violations.append("During lunch break (12:00 PM - 1:00 PM)")
 
+            return violations
+
+        except Exception as e:
+            print(f"Error checking business rules: {e}")
+            return []
+
+    def check_booking_rules(self, date: str, time: str, service: str,
+                            day: DayAppointments = None) -> List[str]:
+        """Check the daily limit and service-specific rules"""
+        violations = []
+
+        try:
             # 4. Check daily appointment limit
-            daily_count = len([apt for apt in self.db.get_appointments()
-                             if apt['date'] == date and apt['status'] in ['pending', 'confirmed']])
+            daily_count = len(day if day is not None else self.get_day_appointments(date))
 
             if daily_count >= self.config['max_daily_appointments']:
                 violations.append(f"Daily appointment limit reached ({self.config['max_daily_appointments']})")
@@ -208,10 +434,9 @@ class SmartScheduler:
     def get_available_slots(self, date: str) -> List[str]:
         """Get all available time slots for a date"""
         try:
-            # Get business hours for the day
+            # Get business hours for the day; the parsed date is reused for every slot
             date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
-            day_name = date_obj.strftime('%A').lower()
-            business_hours = self.get_business_hours(day_name)
+            business_hours = self.get_business_hours(_WEEKDAY_NAMES[date_obj.weekday()])
 
             if not business_hours['open']:
                 return []  # Closed day
@@ -219,13 +444,43 @@ class SmartScheduler:
             # Generate all possible slots
             all_slots = self.generate_time_slots(business_hours)
 
-            # Filter out unavailable slots
+            # Each appointment blocks the half-open window of minutes closer to
+            # its start than the buffer (at least its own start minute)
+            day = self.get_day_appointments(date)
+            radius = max(self.config['buffer_minutes'], 1)
+            events = sorted(
+                [(start - radius + 1, 1) for start in day.starts] +
+                [(start + radius, -1) for start in day.starts]
+            )
+            max_overlaps = self.config.get('max_overlaps', 0)
+            duration = self.get_service_duration('Haircut')  # Default service for checking
+
+            # One calendar query for the whole day; each slot is then checked locally
+            cal_busy = None
+            if self.calendar.is_enabled():
+                cal_busy = BusyIntervals(self.calendar.list_busy_intervals(date))
+
+            # Sweep the (ascending) slots and the window edges together in one pass
             available_slots = []
+            overlapping = 0
+            next_event = 0
 
             for slot in all_slots:
-                conflicts = self.check_appointment_conflicts(date, slot, 'Haircut')  # Default service for checking
-                if not conflicts['has_conflict']:
-                    available_slots.append(slot)
+                minute = self.time_to_minutes(slot)
+                while next_event < len(events) and events[next_event][0] <= minute:
+                    overlapping += events[next_event][1]
+                    next_event += 1
+
+                if overlapping > max_overlaps:
+                    continue
+                if self.check_time_rules(date_obj, minute):
+                    continue
+                if self.check_booking_rules(date, slot, 'Haircut', day):
+                    continue
+                if cal_busy is not None and cal_busy.overlaps(minute, minute + duration):
+                    continue
+
+                available_slots.append(slot)
 
             return available_slots
 
@@ -235,25 +490,10 @@ class SmartScheduler:
 
     def generate_time_slots(self, business_hours: Dict, interval_minutes: int = 60) -> List[str]:
         """Generate time slots based on business hours"""
-        slots = []
-
         try:
-            start_time = datetime.datetime.strptime(business_hours['open'], '%I:%M %p').time()
-            end_time = datetime.datetime.strptime(business_hours['close'], '%I:%M %p').time()
-
-            current_time = datetime.datetime.combine(datetime.date.today(), start_time)
-            end_datetime = datetime.datetime.combine(datetime.date.today(), end_time)
-
-            while current_time < end_datetime:
-                time_str = current_time.strftime('%I:%M %p')
-
-                # Skip lunch break
-                if not self.is_during_lunch_break(time_str):
-                    slots.append(time_str)
-
-                current_time += datetime.timedelta(minutes=interval_minutes)
-
-            return slots
+            # The slots depend only on these values, so each combination is built once
+            return list(_time_slots(business_hours['open'], business_hours['close'],
+                                    interval_minutes, self.lunch_window()))
 
         except Exception as e:
             print(f"Error generating time slots: {e}")
@@ -262,15 +502,12 @@ class SmartScheduler:
     def optimize_daily_schedule(self, date: str) -> Dict:
         """Optimize the schedule for a given day"""
         try:
-            appointments = [apt for apt in self.db.get_appointments()
-                          if apt['date'] == date and apt['status'] in ['pending', 'confirmed']]
+            # Already sorted by time, so the helpers below skip their own sort
+            appointments = self.get_day_appointments(date).appointments
 
             if not appointments:
                 return {'optimized': False, 'reason': 'No appointments to optimize'}
 
-            # Sort appointments by time
-            appointments.sort(key=lambda x: self.parse_time(x['time']))
-
             optimization_report = {
                 'optimized': False,
                 'current_schedule': appointments,
@@ -280,11 +517,11 @@ class SmartScheduler:
             }
 
             # Identify gaps between appointments
-            gaps = self.find_schedule_gaps(appointments)
+            gaps = self.find_schedule_gaps(appointments, pre_sorted=True)
             optimization_report['gaps'] = gaps
 
             # Calculate efficiency score
-            efficiency_score = self.calculate_schedule_efficiency(appointments)
+            efficiency_score = self.calculate_schedule_efficiency(appointments, pre_sorted=True)
             optimization_report['efficiency_score'] = efficiency_score
 
             # Generate optimization suggestions
@@ -299,23 +536,27 @@ class SmartScheduler:
             print(f"Error optimizing schedule: {e}")
             return {'optimized': False, 'error': str(e)}
 
-    def find_schedule_gaps(self, appointments: List[Dict]) -> List[Dict]:
+    def find_schedule_gaps(self, appointments: List[Dict], pre_sorted: bool = False) -> List[Dict]:
         """Find gaps in the schedule"""
         gaps = []
 
         try:
-            for i in range(len(appointments) - 1):
-                current_apt = appointments[i]
-                next_apt = appointments[i + 1]
-
-                current_end = self.add_service_duration(current_apt['time'], current_apt['service'])
-                next_start = self.parse_time(next_apt['time'])
-
-                gap_minutes = (next_start.hour * 60 + next_start.minute) - (current_end.hour * 60 + current_end.minute)
-
-                if gap_minutes > self.config['buffer_minutes'] * 2:  # Significant gap
+            if not pre_sorted:
+                appointments = self.sort_by_time(appointments)
+
+            # Pair each appointment's end with the next one's start as plain ints
+            starts = [self.time_to_minutes(apt['time']) for apt in appointments]
+            ends = [
+                (start + _SERVICE_DURATION_MIN.get(apt['service'], DEFAULT_SERVICE_MINUTES)) % MINUTES_PER_DAY
+                for start, apt in zip(starts, appointments)
+            ]
+            min_gap = self.config['buffer_minutes'] * 2  # Significant gap
+
+            for current_end, next_start, next_apt in zip(ends, starts[1:], appointments[1:]):
+                gap_minutes = next_start - current_end
+                if gap_minutes > min_gap:
                     gaps.append({
-                        'start_time': current_end.strftime('%I:%M %p'),
+                        'start_time': format_minutes(current_end),
                         'end_time': next_apt['time'],
                         'duration_minutes': gap_minutes,
                         'type': 'between_appointments'
@@ -327,30 +568,36 @@ class SmartScheduler:
             print(f"Error finding gaps: {e}")
             return []
 
-    def calculate_schedule_efficiency(self, appointments: List[Dict]) -> float:
+    def calculate_schedule_efficiency(self, appointments: List[Dict], pre_sorted: bool = False) -> float:
         """Calculate schedule efficiency score (0-100)"""
         try:
             if not appointments:
                 return 100
 
+            if not pre_sorted:
+                appointments = self.sort_by_time(appointments)
+
             total_work_time = sum(self.get_service_duration(apt['service']) for apt in appointments)
 
-            first_apt_time = self.parse_time(appointments[0]['time'])
+            first_apt_start = self.time_to_minutes(appointments[0]['time'])
             last_apt = appointments[-1]
-            last_apt_end = self.add_service_duration(last_apt['time'], last_apt['service'])
+            last_apt_end = (self.time_to_minutes(last_apt['time']) +
+                            self.get_service_duration(last_apt['service'])) % MINUTES_PER_DAY
 
-            total_span_minutes = (last_apt_end.hour * 60 + last_apt_end.minute) - (first_apt_time.hour * 60 + first_apt_time.minute)
-
-            if total_span_minutes == 0:
-                return 100
-
-            efficiency = (total_work_time / total_span_minutes) * 100
-            return min(100, efficiency)
+            return self.efficiency_score(total_work_time, last_apt_end - first_apt_start)
 
         except Exception as e:
             print(f"Error calculating efficiency: {e}")
             return 0
 
+    def efficiency_score(self, total_work_minutes: int, total_span_minutes: int) -> float:
+        """Share of the day's span spent working, capped at 100"""
+        if total_span_minutes == 0:
+            return 100
+
+        efficiency = (total_work_minutes / total_span_minutes) * 100
+        return min(100, efficiency)
+
     def generate_optimization_suggestions(self, appointments: List[Dict], gaps: List[Dict]) -> List[str]:
         """Generate suggestions to optimize the schedule"""
         suggestions = []
@@ -381,37 +628,36 @@ class SmartScheduler:
     def times_too_close(self, time1: str, time2: str) -> bool:
         """Check if two times are too close (within buffer)"""
         try:
-            t1 = self.parse_time(time1)
-            t2 = self.parse_time(time2)
-
-            diff_minutes = abs((t1.hour * 60 + t1.minute) - (t2.hour * 60 + t2.minute))
+            diff_minutes = abs(self.time_to_minutes(time1) - self.time_to_minutes(time2))
             return diff_minutes < self.config['buffer_minutes']
 
         except Exception:
             return False
 
+    def sort_by_time(self, appointments: List[Dict]) -> List[Dict]:
+        """Appointments ordered by start time (stored times don't sort as strings)"""
+        return sorted(appointments, key=lambda apt: self.time_to_minutes(apt['time']))
+
+    def time_to_minutes(self, time_str: str) -> int:
+        """Minutes since midnight for a time string"""
+        minutes = parse_minutes(time_str)
+        return DEFAULT_TIME_MINUTES if minutes is None else minutes  # Default to 9 AM
+
     def parse_time(self, time_str: str) -> datetime.time:
         """Parse time string to time object"""
-        try:
-            if 'AM' in time_str or 'PM' in time_str:
-                return datetime.datetime.strptime(time_str, '%I:%M %p').time()
-            else:
-                return datetime.datetime.strptime(time_str, '%H:%M').time()
-        except ValueError:
-            return datetime.time(9, 0)  # Default to 9 AM
+        hour, minute = divmod(self.time_to_minutes(time_str), 60)
+        return datetime.time(hour, minute)
 
     def get_business_hours(self, day: str) -> Dict:
         """Get business hours for a specific day"""
         try:
-            with open('config.json', 'r') as f:
-                config = json.load(f)
-                hours = config.get('business_hours', {})
+            hours = read_config().get('business_hours', {})
 
-                if day in hours and hours[day] != "Closed":
-                    parts = hours[day].split(' - ')
-                    return {'open': parts[0], 'close': parts[1]}
-                else:
-                    return {'open': None, 'close': None}
+            if day in hours and hours[day] != "Closed":
+                parts = hours[day].split(' - ')
+                return {'open': parts[0], 'close': parts[1]}
+            else:
+                return {'open': None, 'close': None}
 
         except Exception:
             return {'open': '9:00 AM', 'close': '6:00 PM'}  # Default hours
@@ -421,47 +667,52 @@ class SmartScheduler:
         if not business_hours['open']:
             return False
 
+        open_minutes = parse_minutes(business_hours['open'])
+        close_minutes = parse_minutes(business_hours['close'])
+        if open_minutes is None or close_minutes is None:
+            return True
+
+        return open_minutes <= time_obj.hour * 60 + time_obj.minute <= close_minutes
+
+    def is_during_lunch_break(self, time: str = None, minutes: int = None) -> bool:
+        """Check if time (or an already-parsed minutes value) is during lunch break"""
         try:
-            open_time = datetime.datetime.strptime(business_hours['open'], '%I:%M %p').time()
-            close_time = datetime.datetime.strptime(business_hours['close'], '%I:%M %p').time()
+            lunch = self.lunch_window()
+            if lunch is None:
+                return False
 
-            return open_time <= time_obj <= close_time
+            if minutes is None:
+                minutes = self.time_to_minutes(time)
+            return lunch[0] <= minutes <= lunch[1]
 
         except Exception:
-            return True
+            return False
 
-    def is_during_lunch_break(self, time: str) -> bool:
-        """Check if time is during lunch break"""
+    def lunch_window(self) -> Optional[Tuple[int, int]]:
+        """Configured lunch break as (start, end) minutes, or None if unset or unparseable"""
         try:
             lunch = self.config['lunch_break']
-            time_obj = self.parse_time(time)
-            lunch_start = datetime.datetime.strptime(lunch['start'], '%H:%M').time()
-            lunch_end = datetime.datetime.strptime(lunch['end'], '%H:%M').time()
+            lunch_start = parse_minutes(lunch['start'])
+            lunch_end = parse_minutes(lunch['end'])
+            if lunch_start is None or lunch_end is None:
+                return None
 
-            return lunch_start <= time_obj <= lunch_end
+            return (lunch_start, lunch_end)
 
         except Exception:
-            return False
+            return None
 
     def get_service_duration(self, service: str) -> int:
         """Get service duration in minutes"""
-        durations = {
-            'Haircut': 45,
-            'Styling': 30,
-            'Coloring': 120,
-            'Treatment': 60,
-            'Special Event': 90
-        }
-        return durations.get(service, 60)
+        return _SERVICE_DURATION_MIN.get(service, DEFAULT_SERVICE_MINUTES)
 
     def add_service_duration(self, time_str: str, service: str) -> datetime.time:
         """Add service duration to a time"""
         try:
             time_obj = self.parse_time(time_str)
-            duration_minutes = self.get_service_duration(service)
 
-            start_datetime = datetime.datetime.combine(datetime.date.today(), time_obj)
-            end_datetime = start_datetime + datetime.timedelta(minutes=duration_minutes)
+            start_datetime = datetime.datetime.combine(_ANCHOR_DATE, time_obj)
+            end_datetime = start_datetime + _SERVICE_DURATION_TD.get(service, _DEFAULT_SERVICE_TD)
 
             return end_datetime.time()
 
@@ -494,7 +745,7 @@ class SmartScheduler:
         """Get day name from date string"""
         try:
             date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
-            return date_obj.strftime('%A')
+            return _WEEKDAY_NAMES[date_obj.weekday()].capitalize()
         except Exception:
             return 'Unknown'
 
@@ -502,31 +753,24 @@ class SmartScheduler:
         """Get smart scheduling statistics"""
         try:
             today = datetime.date.today().isoformat()
-            appointments = self.db.get_appointments()
+            week_ago = (datetime.date.today() - datetime.timedelta(days=7)).isoformat()
 
-            # Calculate statistics
-            total_appointments = len(appointments)
-            today_appointments = len([apt for apt in appointments if apt['date'] == today])
+            # Counts and each recent day's efficiency inputs come from one grouped query
+            stats = self.db.get_appointment_stats(week_ago, _SERVICE_DURATION_MIN,
+                                                  DEFAULT_SERVICE_MINUTES, DEFAULT_TIME_MINUTES)
+            recent_days = stats['days']
 
             # Calculate average efficiency for recent days
-            recent_dates = set(apt['date'] for apt in appointments
-                             if apt['date'] >= (datetime.date.today() - datetime.timedelta(days=7)).isoformat())
-
-            avg_efficiency = 0
-            if recent_dates:
-                efficiencies = []
-                for date in recent_dates:
-                    date_appointments = [apt for apt in appointments if apt['date'] == date]
-                    if len(date_appointments) > 1:
-                        efficiency = self.calculate_schedule_efficiency(date_appointments)
-                        efficiencies.append(efficiency)
-
-                if efficiencies:
-                    avg_efficiency = sum(efficiencies) / len(efficiencies)
+            efficiencies = [
+                self.efficiency_score(work, last_end - first_start)
+                for count, work, first_start, last_end in recent_days.values()
+                if count > 1
+            ]
+            avg_efficiency = sum(efficiencies) / len(efficiencies) if efficiencies else 0
 
             return {
-                'total_appointments': total_appointments,
-                'today_appointments': today_appointments,
+                'total_appointments': stats['total_appointments'],
+                'today_appointments': recent_days.get(today, (0,))[0],
                 'average_efficiency': round(avg_efficiency, 1),
                 'calendar_integration': self.calendar.is_enabled(),
                 'conflict_detection': True,
@@ -4,32 +4,89 @@ AI Voice Agent Startup Script
 Simple launcher for the chat interface and backend server
 """
 
+import hashlib
 import os
 import sys
+import socket
 import subprocess
+import threading
 import webbrowser
 import time
 from pathlib import Path
 
+# How often (seconds) to probe the server port, and how long to keep trying
+PORT_POLL_INTERVAL = 0.05
+PORT_POLL_TIMEOUT = 30
+
+# Records the requirements.txt hash (per interpreter) that was last verified as installed
+DEPS_SENTINEL = Path.home() / ".cache" / "voiceagent" / "deps_ok"
+
+def requirements_hash():
+    """Hash of requirements.txt and the running interpreter (None if the file is missing)"""
+    try:
+        with open("requirements.txt", "rb") as f:
+            digest = hashlib.sha1(f.read())
+    except OSError:
+        return None
+    digest.update(sys.executable.encode())
+    return digest.hexdigest()
+
+def mark_requirements_ok(deps_hash):
+    """Remember that the current requirements are installed"""
+    if deps_hash is None:
+        return
+    try:
+        DEPS_SENTINEL.parent.mkdir(parents=True, exist_ok=True)
+        DEPS_SENTINEL.write_text(deps_hash)
+    except OSError:
+        pass
+
 def check_requirements():
     """Check if required dependencies are installed"""
+    # Skip the probe entirely when these exact requirements were already verified
+    deps_hash = requirements_hash()
+    try:
+        if deps_hash is not None and DEPS_SENTINEL.read_text() == deps_hash:
+            print("✅ All dependencies are installed")
+            return True
+    except OSError:
+        pass
+
     try:
         import flask
         import flask_cors
         print("✅ All dependencies are installed")
+        mark_requirements_ok(deps_hash)
         return True
     except ImportError as e:
         print(f"❌ Missing dependency: {e}")
         print("\n🔧 Installing requirements...")
         try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+            subprocess.check_call([
+                sys.executable, "-m", "pip", "install", "--no-input", "--quiet",
+                "--disable-pip-version-check", "-r", "requirements.txt"
+            ])
             print("✅ Dependencies installed successfully")
+            mark_requirements_ok(deps_hash)
             return True
         except subprocess.CalledProcessError:
             print("❌ Failed to install dependencies")
             print("Please run: pip install -r requirements.txt")
             return False
 
+def open_browser_when_ready(url: str, host: str = 'localhost', port: int = 5000):
+    """Open the browser as soon as the server accepts connections"""
+    deadline = time.monotonic() + PORT_POLL_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.1):
+                webbrowser.open(url)
+                return
+        except OSError:
+            time.sleep(PORT_POLL_INTERVAL)
+
+    print(f"⚠️ Server did not come up within {PORT_POLL_TIMEOUT}s, open {url} manually")
+
 def main():
     """Main startup function"""
     print("🤖 AI Voice Agent - Starting...")
@@ -53,20 +110,15 @@ def main():
     print("=" * 50)
 
     try:
-        # Give a moment for the message to be read
-        time.sleep(2)
-
         # Import and run the Flask app
         from app import app
 
-        # Open browser automatically
-        def open_browser():
-            time.sleep(1.5)
-            webbrowser.open('http://localhost:5000')
-
-        import threading
-        timer = threading.Timer(1.5, open_browser)
-        timer.start()
+        # Open browser automatically once the server is listening
+        threading.Thread(
+            target=open_browser_when_ready,
+            args=('http://localhost:5000',),
+            daemon=True
+        ).start()
 
         # Start the Flask server
         app.run(